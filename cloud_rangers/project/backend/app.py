@@ -1,17 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 import sys
 import os
+import json
+import asyncio
+import atexit
+import logging
+import threading
+import time
 
 # Add current directory to path so we can import utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.product_lookup import lookup_product
-from utils.data_processor import normalize_product_data, parse_ingredients
-from utils.risk_engine import load_banned_ingredients, check_banned_ingredients, calculate_health_score
-from utils.gemini_integration import GeminiHandler
+from utils.data_processor import normalize_product_data
+from utils.risk_engine import load_banned_ingredients, rules_version, diff_rules, check_banned_ingredients
+from utils.analysis import parse_fields, product_version, analyze_product
+from utils.http_utils import strong_etag, etag_matches, dumps_json, run_until_disconnected, ClientDisconnected
+from utils.profile_engine import compile_profile, match_product, evaluate_profiles
+from utils.alternatives_index import CategoryIndex
+from utils.search_index import SearchIndex
+from utils.catalog import iter_catalog
+from utils.explanation_queue import ExplanationQueue
+from utils.gemini_integration import GeminiHandler, DEFAULT_TIMEOUT
+from utils.prompt_builder import DEFAULT_TOKEN_BUDGET
+from utils.fallback_explainer import build_fallback_explanation
+from utils.pending_results import PendingResults
+from utils.jobs import JobStore, JobManager, QUEUED, RUNNING
+from utils.analysis import ALL_FIELDS, PRODUCT_FIELDS, ANALYSIS_FIELDS
+from utils.product_cache import ProductCache
+from utils.compact_product import CompactProduct, intern_strings
+from utils.warmup import AccessTracker, load_popular, warm_up
+from utils.quota import quota_manager, QuotaExceeded, INTERACTIVE, BATCH, WARMUP
+from utils.image_cache import ImageCache, ImageFetchError, DEFAULT_ALLOWED_HOSTS, snap_width, preferred_format, FORMATS
+from utils.recall_index import RecallIndex, RecallCrawler
+from utils.ingredient_index import IngredientIndex
+from utils.history import HistorySink, history_row
+from utils.logging_setup import setup_logging, request_id_var, new_request_id
+from news_service import get_safety_news, recall_feeds
+
+# JSON logs are written by a background thread; request handlers only enqueue.
+# LOG_DEBUG_SAMPLE_RATE keeps that fraction of high-volume debug events.
+log_listener = setup_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    debug_sample_rate=float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 0.01)),
+)
+atexit.register(log_listener.stop)
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -23,16 +61,388 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Gemini
-try:
-    gemini = GeminiHandler()
-except Exception as e:
-    print(f"Warning: Gemini not initialized: {e}")
-    gemini = None
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """
+    Tags every log record written while handling the request with its id
+    (the caller's X-Request-ID if given), and echoes it back.
+    """
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    request_id_var.set(request_id)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    """
+    Upstream quota problems are reported as 503 with Retry-After, never as
+    "not found".
+    """
+    retry_after = max(1, int(exc.retry_after or 1))
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "upstream": exc.upstream, "quota_exceeded": True},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+# Gemini and the banned ingredients table (pandas) are loaded on first use,
+# so workers that never serve those routes never pay for the imports.
+_gemini = None
+_gemini_error = None
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT_S", DEFAULT_TIMEOUT))
+GEMINI_PROMPT_TOKEN_BUDGET = int(os.environ.get("GEMINI_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+def get_gemini():
+    """
+    Returns the shared GeminiHandler, initializing it on first call.
+    Returns None if Gemini is not configured.
+    """
+    global _gemini, _gemini_error
+    if _gemini is None and _gemini_error is None:
+        try:
+            _gemini = GeminiHandler(timeout=GEMINI_TIMEOUT, token_budget=GEMINI_PROMPT_TOKEN_BUDGET)
+        except Exception as e:
+            logger.warning("Gemini not initialized: %s", e)
+            _gemini_error = e
+    return _gemini
+
+# All explanation requests share one quota-aware queue (batching is opt-in)
+explanation_queue = ExplanationQueue(
+    get_gemini,
+    max_in_flight=int(os.environ.get("GEMINI_MAX_IN_FLIGHT", 4)),
+    batch_size=int(os.environ.get("GEMINI_BATCH_SIZE", 1)),
+    batch_window=float(os.environ.get("GEMINI_BATCH_WINDOW_MS", 50)) / 1000,
+    timeout=GEMINI_TIMEOUT,
+)
+
+# /api/analyze answers within this budget; slower AI explanations are
+# returned later through an upgrade token
+ANALYZE_LATENCY_BUDGET = float(os.environ.get("ANALYZE_LATENCY_BUDGET_MS", 400)) / 1000
+pending_explanations = PendingResults(ttl=float(os.environ.get("ANALYZE_UPGRADE_TTL_S", 600)))
 
 # Load Banned Ingredients
 BANNED_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "banned_ingredients.csv")
-banned_df = load_banned_ingredients(BANNED_DB_PATH)
+RULES_VERSION = rules_version(BANNED_DB_PATH)
+_banned_df = None
+
+def get_banned_df():
+    global _banned_df
+    if _banned_df is None:
+        _banned_df = load_banned_ingredients(BANNED_DB_PATH)
+    return _banned_df
+
+# Local indexes over every product this worker has analyzed or imported
+alternatives_index = CategoryIndex(
+    top_k=int(os.environ.get("ALTERNATIVES_TOP_K", 20)),
+    max_products=int(os.environ.get("ALTERNATIVES_MAX_PRODUCTS", 100000)),
+)
+search_index = SearchIndex(max_products=int(os.environ.get("SEARCH_INDEX_MAX_PRODUCTS", 100000)))
+
+# Optional JSONL catalog export indexed in the background at startup
+CATALOG_PATH = os.environ.get("CATALOG_PATH")
+
+# Normalized products and their analyses, so popular products skip the upstreams.
+# Products are cached as CompactProduct and expanded per request.
+product_cache = ProductCache(
+    max_entries=int(os.environ.get("PRODUCT_CACHE_SIZE", 5000)),
+    ttl=float(os.environ.get("PRODUCT_CACHE_TTL_S", 3600)),
+)
+# Ingredient tokens / additive tags -> cached analyses, for incremental rule reloads
+ingredient_index = IngredientIndex()
+analysis_cache = ProductCache(
+    max_entries=product_cache.max_entries, ttl=product_cache.ttl, on_evict=ingredient_index.remove
+)
+
+def load_product(barcode, priority=INTERACTIVE):
+    """
+    Looks up and normalizes a product. Returns None if it is not found.
+    """
+    compact = product_cache.get(barcode)
+    if compact is None:
+        raw_data = lookup_product(barcode, priority)
+        if not raw_data:
+            return None
+        compact = CompactProduct.from_dict(normalize_product_data(raw_data))
+        product_cache.set(barcode, compact)
+    # Always expand from the compact form so cached and fresh responses match
+    return compact.to_dict()
+
+def cached_analysis(barcode, product):
+    """
+    Returns the cached ANALYSIS_FIELDS for this exact product data and rules
+    version, or None.
+    """
+    entry = analysis_cache.get(barcode)
+    if entry is not None and entry[0] == (product_version(product), RULES_VERSION):
+        return entry[1]
+    return None
+
+def store_analysis(barcode, product, analysis):
+    if all(f in analysis for f in ANALYSIS_FIELDS):
+        cached = {f: analysis[f] for f in ANALYSIS_FIELDS}
+        cached["parsed_ingredients"] = intern_strings(cached["parsed_ingredients"])
+        analysis_cache.set(barcode, ((product_version(product), RULES_VERSION), cached))
+        ingredient_index.add(barcode, cached["parsed_ingredients"], product.get("additives_tags"))
+
+def index_product(barcode, product, analysis=None):
+    """
+    Feeds an analyzed product into the local indexes, computing the
+    analysis parts the indexes need if the caller did not.
+    """
+    analysis = analysis or {}
+    missing = tuple(f for f in ("risks", "health_score") if f not in analysis)
+    if missing:
+        analysis = dict(analysis, **analyze_product(product, get_banned_df(), missing))
+    alternatives_index.add(barcode, product, analysis["health_score"], analysis["risks"])
+    search_index.add(barcode, dict(product, parsed_ingredients=analysis.get("parsed_ingredients")), analysis["health_score"])
+
+def import_catalog(path):
+    count = 0
+    for barcode, raw_data in iter_catalog(path):
+        try:
+            index_product(barcode, normalize_product_data(raw_data))
+            count += 1
+        except Exception as e:
+            logger.warning("Error importing catalog product %s: %s", barcode, e)
+    logger.info("Imported %d catalog products from %s", count, path)
+
+@app.on_event("startup")
+async def start_catalog_import():
+    if CATALOG_PATH:
+        threading.Thread(target=import_catalog, args=(CATALOG_PATH,), daemon=True).start()
+
+# ---------------------------
+# Cache warming
+# ---------------------------
+# Interactive lookups are counted; the most popular barcodes are persisted
+# and prefetched (product + analysis) after the next restart.
+POPULAR_BARCODES_PATH = os.environ.get(
+    "POPULAR_BARCODES_PATH", os.path.join(os.path.dirname(__file__), "data", "popular_barcodes.json")
+)
+WARMUP_TOP_N = int(os.environ.get("WARMUP_TOP_N", 200))
+WARMUP_RATE = float(os.environ.get("WARMUP_REQUESTS_PER_SECOND", 2))
+access_tracker = AccessTracker(
+    POPULAR_BARCODES_PATH, top_n=WARMUP_TOP_N, flush_interval=float(os.environ.get("WARMUP_FLUSH_INTERVAL_S", 300))
+)
+_warmup_stop = threading.Event()
+
+def warm_product(barcode):
+    product = load_product(barcode, WARMUP)
+    if not product:
+        return
+    analysis = cached_analysis(barcode, product)
+    if analysis is None:
+        analysis = analyze_product(product, get_banned_df(), ANALYSIS_FIELDS)
+        store_analysis(barcode, product, analysis)
+    index_product(barcode, product, analysis)
+
+def run_warmup(barcodes):
+    start = time.monotonic()
+    warmed = warm_up(barcodes, warm_product, rate=WARMUP_RATE, stop_event=_warmup_stop)
+    logger.info("Warmed %d/%d popular products in %.1fs", warmed, len(barcodes), time.monotonic() - start)
+
+@app.on_event("startup")
+async def start_warmup():
+    access_tracker.start()
+    barcodes = load_popular(POPULAR_BARCODES_PATH, WARMUP_TOP_N)
+    if barcodes and WARMUP_RATE > 0:
+        threading.Thread(target=run_warmup, args=(barcodes,), daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_warmup():
+    _warmup_stop.set()
+    access_tracker.stop()
+
+# ---------------------------
+# Rules reload
+# ---------------------------
+# banned_ingredients.csv is polled for changes. Only cached analyses whose
+# ingredients or additives could match an added, removed or modified rule
+# are re-checked; every other cached analysis is carried over to the new
+# rules version as is.
+RULES_RELOAD_INTERVAL = float(os.environ.get("RULES_RELOAD_INTERVAL_S", 30))
+_rules_stop = threading.Event()
+
+def reload_rules():
+    """
+    Swaps in the rules file if it changed and brings the analysis cache up
+    to date. Returns the number of re-checked products, or None if the rules
+    did not change.
+    """
+    global _banned_df, RULES_VERSION
+    version = rules_version(BANNED_DB_PATH)
+    if version == RULES_VERSION:
+        return None
+    if _banned_df is None:
+        # Nothing has been analyzed with the old rules yet
+        RULES_VERSION = version
+        return 0
+
+    old_df, new_df = get_banned_df(), load_banned_ingredients(BANNED_DB_PATH)
+    names, tags = diff_rules(old_df, new_df)
+    affected = ingredient_index.candidates(names, tags)
+    old_version = RULES_VERSION
+    _banned_df, RULES_VERSION = new_df, version
+
+    for barcode in analysis_cache.keys():
+        entry = analysis_cache.get(barcode)
+        if entry is None:
+            ingredient_index.remove(barcode)
+        elif barcode not in affected and entry[0][1] == old_version:
+            analysis_cache.replace(barcode, ((entry[0][0], version), entry[1]))
+
+    rechecked = 0
+    for barcode in affected:
+        entry = analysis_cache.get(barcode)
+        compact = product_cache.get(barcode)
+        if entry is None or compact is None:
+            # Recomputed on demand if it is requested again
+            analysis_cache.pop(barcode)
+            ingredient_index.remove(barcode)
+            continue
+        product = compact.to_dict()
+        if entry[0][0] != product_version(product):
+            continue
+        cached = dict(entry[1], risks=check_banned_ingredients(
+            list(entry[1]["parsed_ingredients"]), new_df, product.get("additives_tags")
+        ))
+        analysis_cache.replace(barcode, ((entry[0][0], version), cached))
+        if barcode in alternatives_index:
+            index_product(barcode, product, cached)
+        rechecked += 1
+
+    logger.info(
+        "Rules changed (%s -> %s): %d rules differ, re-checked %d of %d cached analyses",
+        old_version, version, len(names), rechecked, len(analysis_cache),
+    )
+    return rechecked
+
+def watch_rules():
+    while not _rules_stop.wait(RULES_RELOAD_INTERVAL):
+        try:
+            reload_rules()
+        except Exception:
+            logger.exception("Error reloading rules")
+
+@app.on_event("startup")
+async def start_rules_watcher():
+    if RULES_RELOAD_INTERVAL > 0:
+        threading.Thread(target=watch_rules, daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_rules_watcher():
+    _rules_stop.set()
+
+# ---------------------------
+# Analysis history
+# ---------------------------
+# Every served analysis is buffered in memory and written in batches to
+# day-partitioned Parquet files for reporting (see tools.history_report).
+HISTORY_DIR = os.environ.get("HISTORY_DIR", os.path.join(os.path.dirname(__file__), "data", "history"))
+history_sink = HistorySink(
+    HISTORY_DIR,
+    flush_rows=int(os.environ.get("HISTORY_FLUSH_ROWS", 10000)),
+    flush_interval=float(os.environ.get("HISTORY_FLUSH_INTERVAL_S", 60)),
+)
+
+def record_history(barcode, product, analysis, channel, cached, start):
+    history_sink.record(history_row(
+        barcode, analysis, source=product.get("source"), channel=channel, rules_version=RULES_VERSION,
+        cached=cached, duration_ms=(time.perf_counter() - start) * 1000,
+    ))
+
+@app.on_event("startup")
+async def start_history():
+    if HISTORY_DIR:
+        history_sink.start()
+    else:
+        history_sink.enabled = False
+
+@app.on_event("shutdown")
+async def stop_history():
+    history_sink.stop()
+
+# ---------------------------
+# Recall index
+# ---------------------------
+# Recall/safety feeds are crawled in the background so product responses can
+# carry recall flags without a network call.
+RECALL_CRAWL_INTERVAL = float(os.environ.get("RECALL_CRAWL_INTERVAL_S", 3600))
+recall_index = RecallIndex()
+recall_crawler = RecallCrawler(recall_index, recall_feeds(), interval=RECALL_CRAWL_INTERVAL)
+
+def recall_flags(product):
+    return recall_index.lookup(product.get("brand"), product.get("name"))
+
+@app.on_event("startup")
+async def start_recall_crawler():
+    if RECALL_CRAWL_INTERVAL > 0:
+        recall_crawler.start()
+
+@app.on_event("shutdown")
+async def stop_recall_crawler():
+    recall_crawler.stop()
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+# Slow work (AI explanations, news aggregation, full lookups with the USDA
+# fallback) can run as persistent jobs instead of inline in the request.
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "jobs.sqlite3"))
+job_manager = JobManager(
+    JobStore(JOBS_DB_PATH),
+    result_ttl=float(os.environ.get("JOBS_RESULT_TTL_S", 3600)),
+    lease=float(os.environ.get("JOBS_LEASE_S", 60)),
+)
+_main_loop = None
+
+def run_explanation_job(payload):
+    fallback = build_fallback_explanation(payload["product_name"], payload["risks"], payload.get("health_score"))
+    if get_gemini() is None:
+        return {"explanation": fallback, "source": "rules"}
+    # Go through the shared queue so jobs respect the same Gemini quota as live requests
+    future = asyncio.run_coroutine_threadsafe(
+        explanation_queue.explain(payload["product_name"], payload["ingredients"], payload["risks"],
+                                  raise_errors=True, priority=BATCH),
+        _main_loop,
+    )
+    try:
+        explanation = future.result(timeout=GEMINI_TIMEOUT * 4)
+    except TimeoutError:
+        # Otherwise the call keeps running (and holding its quota slot) after the attempt failed
+        future.cancel()
+        raise
+    return {"explanation": explanation, "source": "ai"}
+
+def run_news_job(payload):
+    return {"news": get_safety_news(payload["product_name"], payload.get("max_articles", 10), BATCH)}
+
+def run_product_job(payload):
+    barcode = str(payload["barcode"])
+    product = load_product(barcode, BATCH)
+    if not product:
+        return {"barcode": barcode, "found": False}
+    response = analyze_product(product, get_banned_df(), ALL_FIELDS)
+    index_product(barcode, product, response)
+    return dict(response, recalls=recall_flags(product), barcode=barcode, found=True)
+
+job_manager.register("explanation", run_explanation_job, concurrency=int(os.environ.get("JOBS_EXPLANATION_CONCURRENCY", 4)),
+                     required=("product_name", "ingredients", "risks"))
+job_manager.register("news", run_news_job, concurrency=int(os.environ.get("JOBS_NEWS_CONCURRENCY", 2)),
+                     required=("product_name",))
+job_manager.register("product", run_product_job, concurrency=int(os.environ.get("JOBS_PRODUCT_CONCURRENCY", 4)),
+                     required=("barcode",))
+
+@app.on_event("startup")
+async def start_jobs():
+    global _main_loop
+    _main_loop = asyncio.get_running_loop()
+    job_manager.start()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    job_manager.stop()
 
 class ProductRequest(BaseModel):
     query: str
@@ -41,77 +451,405 @@ class AnalysisRequest(BaseModel):
     product_name: str
     ingredients: List[str]
     risks: List[dict]
+    health_score: Optional[float] = None
+
+class NewsRequest(BaseModel):
+    product_name: str
+    max_articles: int = 10
+
+class HealthProfile(BaseModel):
+    # Same shape as the healthProfile saved by survey.js / profile.js
+    name: Optional[str] = None
+    allergies: List[str] = []
+    dietaryPreference: Optional[str] = None
+    conditions: List[str] = []
+    age: Optional[Union[int, float, str]] = None
+
+class EvaluationRequest(BaseModel):
+    profiles: List[HealthProfile]
 
 @app.get("/api/product/{barcode}")
-async def get_product(barcode: str):
-    print(f"Fetching product: {barcode}")
-    raw_data = lookup_product(barcode)
+async def get_product(barcode: str, request: Request, fields: Optional[str] = None):
+    """
+    `fields` is an optional comma-separated list (e.g. fields=health_score,risks)
+    restricting which parts of the response are computed and sent.
+    """
+    start = time.perf_counter()
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.debug("Fetching product", extra={"barcode": barcode})
+    product = await asyncio.to_thread(load_product, barcode)
     
-    if not raw_data:
+    if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    # Normalize
-    product = normalize_product_data(raw_data)
-    
-    # Parse Ingredients
-    ingredients_list = parse_ingredients(product['ingredients_text'])
-    
-    # Risk Check
-    risks = check_banned_ingredients(ingredients_list, banned_df)
-    
-    # Health Score
-    score = calculate_health_score(product.get('nutriments', {}))
-    
-    # Enrich response
-    product['parsed_ingredients'] = ingredients_list
-    product['risks'] = risks
-    product['health_score'] = score
-    
-    return product
+    access_tracker.record(barcode)
+
+    # Same product data + same rules (+ same recall index) + same field selection => same response
+    recalls_version = recall_index.version if "recalls" in selected else ""
+    etag = strong_etag(f"{product_version(product)}:{RULES_VERSION}:{recalls_version}:{','.join(selected)}".encode("utf-8"))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Parse ingredients, check risks and score only for the selected fields
+    analysis = cached_analysis(barcode, product)
+    if analysis is not None:
+        response = {f: analysis[f] if f in ANALYSIS_FIELDS else product.get(f) for f in selected}
+    else:
+        response = analyze_product(product, get_banned_df(), selected)
+        store_analysis(barcode, product, response)
+    if "recalls" in selected:
+        response["recalls"] = recall_flags(product)
+
+    # Keep the local indexes current; sparse requests only pay for it once per product
+    if barcode not in alternatives_index or ("risks" in response and "health_score" in response):
+        index_product(barcode, product, response)
+    record_history(barcode, product, response, "http", analysis is not None, start)
+
+    return Response(content=dumps_json(response), media_type="application/json", headers=headers)
+
+@app.post("/api/product/{barcode}/evaluate")
+async def evaluate_product(barcode: str, request: EvaluationRequest):
+    """
+    Evaluates a product against several health profiles (e.g. a household).
+    The product is matched once; each profile is then a single bitwise AND.
+    """
+    product = await asyncio.to_thread(load_product, barcode)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    analysis = analyze_product(product, get_banned_df(), ("name", "parsed_ingredients", "risks", "health_score"))
+    index_product(barcode, product, analysis)
+    conditions, product_mask = match_product(analysis["parsed_ingredients"], product.get("nutriments", {}))
+
+    profile_masks = [
+        compile_profile(p.allergies, p.dietaryPreference, p.conditions, p.age)
+        for p in request.profiles
+    ]
+    results = evaluate_profiles(product_mask, profile_masks)
+
+    return {
+        "name": analysis["name"],
+        "risks": analysis["risks"],
+        "health_score": analysis["health_score"],
+        "conditions": sorted(conditions),
+        "profiles": [
+            {"name": p.name, "warnings": warnings, "safe": not warnings}
+            for p, warnings in zip(request.profiles, results)
+        ],
+    }
+
+@app.get("/api/product/{barcode}/alternatives")
+async def get_alternatives(barcode: str, limit: int = 5):
+    """
+    Healthier products from the same categories, served from the local index.
+    """
+    if barcode not in alternatives_index:
+        product = await asyncio.to_thread(load_product, barcode)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        index_product(barcode, product)
+
+    return {
+        "barcode": barcode,
+        "alternatives": alternatives_index.alternatives(barcode, max(1, min(limit, 50))) or [],
+        "indexed_products": len(alternatives_index),
+    }
+
+@app.get("/api/search")
+async def search_products(q: str, limit: int = 10):
+    """
+    Searches locally known products by name, brand and ingredients.
+    """
+    return {"query": q, "results": search_index.search(q, max(1, min(limit, 50)))}
+
+@app.get("/api/search/autocomplete")
+async def autocomplete_products(q: str, limit: int = 8):
+    """
+    Prefix type-ahead over product names and brands.
+    """
+    return {"query": q, "suggestions": search_index.autocomplete(q, max(1, min(limit, 20)))}
 
 @app.post("/api/analyze")
-async def analyze_product(request: AnalysisRequest):
+async def explain_product(request: AnalysisRequest, raw_request: Request, upgrade: bool = True):
+    """
+    Returns the AI explanation if it is ready within the latency budget,
+    otherwise an instant rule-based explanation plus an `upgrade_token` for
+    GET /api/analyze/{token}. Pass upgrade=false to skip the AI follow-up.
+    """
+    fallback = build_fallback_explanation(request.product_name, request.risks, request.health_score)
+    gemini = get_gemini()
     if not gemini:
-        raise HTTPException(status_code=503, detail="AI Service Unavailable")
-        
-    explanation = gemini.explain_risks(
+        return {"explanation": fallback, "source": "rules"}
+
+    task = asyncio.ensure_future(explanation_queue.explain(
         request.product_name,
         request.ingredients,
-        request.risks
-    )
-    
-    return {"explanation": explanation}
+        request.risks,
+        raise_errors=True
+    ))
+
+    # If the client goes away, stop waiting and cancel the model call
+    try:
+        await run_until_disconnected(raw_request.is_disconnected, asyncio.wait({task}, timeout=ANALYZE_LATENCY_BUDGET))
+    except ClientDisconnected:
+        task.cancel()
+        return Response(status_code=499)
+
+    if task.done() and not task.cancelled() and task.exception() is None:
+        return {"explanation": task.result(), "source": "ai"}
+
+    if task.done() or not upgrade:
+        task.cancel()
+        return {"explanation": fallback, "source": "rules"}
+
+    token = pending_explanations.add(task, fallback)
+    return {"explanation": fallback, "source": "rules", "upgrade_token": token}
+
+@app.get("/api/analyze/{token}")
+async def get_upgraded_explanation(token: str, wait: float = 0):
+    """
+    Fetches the AI explanation behind an upgrade token. `wait` long-polls for
+    up to that many seconds (max 30) before answering "not ready".
+    """
+    pending = pending_explanations.get(token)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade token")
+    task, fallback = pending
+
+    if not task.done() and wait > 0:
+        await asyncio.wait({task}, timeout=min(wait, 30))
+    if not task.done():
+        return Response(content=dumps_json({"ready": False}), status_code=202, media_type="application/json")
+
+    pending_explanations.pop(token)
+    if task.cancelled() or task.exception() is not None:
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        return {"ready": True, "explanation": fallback, "source": "rules", "error": error}
+    return {"ready": True, "explanation": task.result(), "source": "ai"}
+
+@app.post("/api/jobs/{job_type}", status_code=202)
+async def submit_job(job_type: str, payload: dict):
+    """
+    Queues background work (job types: explanation, news, product) and
+    returns its id immediately. Identical submissions share one job.
+    """
+    try:
+        job_id = await asyncio.to_thread(job_manager.submit, job_type, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await asyncio.to_thread(job_manager.get, job_id)
+    return {"job_id": job_id, "status": job["status"]}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Job status and result. `wait` long-polls for up to that many seconds (max 30).
+    """
+    deadline = asyncio.get_running_loop().time() + min(max(wait, 0), 30)
+    while True:
+        job = await asyncio.to_thread(job_manager.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] not in (QUEUED, RUNNING) or asyncio.get_running_loop().time() >= deadline:
+            return job
+        await asyncio.sleep(0.25)
+
+# ---------------------------
+# WebSocket scan sessions
+# ---------------------------
+async def run_scan(barcode, send):
+    """
+    Runs the scan pipeline for one barcode, pushing each stage as soon as it
+    is ready: product, analysis (risks + score), explanation, news.
+    """
+    start = time.perf_counter()
+    product = await asyncio.to_thread(load_product, barcode)
+    if not product:
+        await send({"stage": "error", "barcode": barcode, "detail": "Product not found"})
+        return
+    access_tracker.record(barcode)
+    await send({"stage": "product", "barcode": barcode,
+                "data": dict({f: product.get(f) for f in PRODUCT_FIELDS if f != "nutriments"},
+                             recalls=recall_flags(product))})
+
+    # News only needs the name, so it runs alongside analysis and explanation
+    news_task = asyncio.ensure_future(asyncio.to_thread(get_safety_news, product["name"]))
+    try:
+        analysis = cached_analysis(barcode, product)
+        cached = analysis is not None
+        if not cached:
+            analysis = await asyncio.to_thread(analyze_product, product, get_banned_df(), ANALYSIS_FIELDS)
+            store_analysis(barcode, product, analysis)
+        await asyncio.to_thread(index_product, barcode, product, analysis)
+        await send({"stage": "analysis", "barcode": barcode, "data": analysis})
+        record_history(barcode, product, analysis, "ws", cached, start)
+
+        fallback = build_fallback_explanation(product["name"], analysis["risks"], analysis["health_score"])
+        if get_gemini() is None:
+            await send({"stage": "explanation", "barcode": barcode, "data": {"explanation": fallback, "source": "rules"}})
+        else:
+            try:
+                explanation = await explanation_queue.explain(
+                    product["name"], analysis["parsed_ingredients"], analysis["risks"], raise_errors=True
+                )
+                data = {"explanation": explanation, "source": "ai"}
+            except Exception as e:
+                data = {"explanation": fallback, "source": "rules", "error": str(e)}
+            await send({"stage": "explanation", "barcode": barcode, "data": data})
+
+        try:
+            news = await news_task
+        except Exception as e:
+            logger.warning("Error fetching news: %s", e, extra={"barcode": barcode})
+            news = []
+        await send({"stage": "news", "barcode": barcode, "data": {"news": news}})
+    finally:
+        if not news_task.done():
+            news_task.cancel()
+
+    await send({"stage": "done", "barcode": barcode})
+
+@app.websocket("/ws/scan")
+async def scan_session(websocket: WebSocket):
+    """
+    One connection per scanning session. The client sends barcodes, either
+    as plain text or as {"barcode": "..."}; the server answers each with
+    {"stage": ..., "barcode": ..., "data": ...} messages in the order
+    product, analysis, explanation, news, done (or a single "error").
+    Scans run concurrently, so a new barcode never waits for an older one.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    scans = set()
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_text(dumps_json(message).decode("utf-8"))
+
+    async def scan(barcode):
+        # Each scan runs in its own task, so its id doesn't leak into the others
+        request_id_var.set(new_request_id())
+        try:
+            await run_scan(barcode, send)
+        except (WebSocketDisconnect, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            logger.exception("Error in scan session", extra={"barcode": barcode})
+            try:
+                await send({"stage": "error", "barcode": barcode, "detail": str(e)})
+            except Exception:
+                pass
+
+    try:
+        while True:
+            message = (await websocket.receive_text()).strip()
+            if message.startswith("{"):
+                try:
+                    message = str(json.loads(message).get("barcode", "")).strip()
+                except (ValueError, AttributeError):
+                    message = ""
+            if not message:
+                await send({"stage": "error", "detail": "Expected a barcode"})
+                continue
+
+            task = asyncio.ensure_future(scan(message))
+            scans.add(task)
+            task.add_done_callback(scans.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Nobody is listening any more; stop upstream and model calls
+        for task in scans:
+            task.cancel()
+
+# ---------------------------
+# Image proxy
+# ---------------------------
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "data", "image_cache"))
+# Comma-separated hosts (subdomains included) the proxy may fetch from; "*" allows any public host
+IMAGE_PROXY_HOSTS = os.environ.get("IMAGE_PROXY_HOSTS", ",".join(DEFAULT_ALLOWED_HOSTS))
+image_cache = ImageCache(
+    IMAGE_CACHE_DIR,
+    max_bytes=int(os.environ.get("IMAGE_CACHE_MAX_MB", 200)) * 1024 * 1024,
+    allow_private=os.environ.get("IMAGE_PROXY_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes"),
+    allowed_hosts=None if IMAGE_PROXY_HOSTS.strip() == "*" else [h.strip() for h in IMAGE_PROXY_HOSTS.split(",") if h.strip()],
+)
+
+@app.get("/api/image")
+async def proxy_image(url: str, request: Request, w: int = 200):
+    """
+    Serves a resized WebP (or JPEG, if the client does not accept WebP)
+    thumbnail of a remote product image (IMAGE_PROXY_HOSTS only). Each thumbnail is fetched
+    and rendered once, then served from disk with long cache headers.
+    """
+    width = snap_width(w)
+    fmt = preferred_format(request.headers.get("accept"))
+    try:
+        path = await asyncio.to_thread(image_cache.get, url, width, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageFetchError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    return FileResponse(path, media_type=FORMATS[fmt], headers={
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept",
+    })
+
+@app.get("/api/quota")
+async def get_quota_stats():
+    """
+    Per-upstream limits, queue lengths and quota failures.
+    """
+    return quota_manager.stats()
+
+@app.post("/api/news")
+def get_news(request: NewsRequest):
+    # Plain def: feed parsing and article scraping block, so FastAPI runs this in its threadpool
+    news = get_safety_news(request.product_name, request.max_articles)
+    return {"news": news}
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from utils.static_assets import StaticAssetCache
 
 # Mount frontend
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
+# HTML/JS/CSS are loaded and precompressed once at startup and served from memory
+static_assets = StaticAssetCache(frontend_path)
+
+def serve_asset(name, request: Request):
+    rendered = static_assets.render(
+        name,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+    )
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    status, body, headers = rendered
+    media_type = headers.pop("Content-Type")
+    return Response(content=body, status_code=status, headers=headers, media_type=None if status == 304 else media_type)
+
 @app.get("/")
-async def read_index():
-    return FileResponse(os.path.join(frontend_path, "index.html"))
+async def read_index(request: Request):
+    return serve_asset("index.html", request)
 
 # Serve other HTML files directly if needed (e.g. scanner.html)
 @app.get("/{filename}.html")
-async def read_html(filename: str):
-    file_path = os.path.join(frontend_path, f"{filename}.html")
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="File not found")
+async def read_html(filename: str, request: Request):
+    return serve_asset(f"{filename}.html", request)
 
 # Also serve js/css if they are in root of frontend
 @app.get("/{filename}.js")
-async def read_js(filename: str):
-    file_path = os.path.join(frontend_path, f"{filename}.js")
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="File not found")
+async def read_js(filename: str, request: Request):
+    return serve_asset(f"{filename}.js", request)
 
 @app.get("/{filename}.css")
-async def read_css(filename: str):
-    file_path = os.path.join(frontend_path, f"{filename}.css")
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="File not found")
+async def read_css(filename: str, request: Request):
+    return serve_asset(f"{filename}.css", request)
@@ -21,3 +21,19 @@ def get_api_key(service):
         return os.environ.get(env_key)
     
     return secrets.get("general", {}).get(f"{service}_api_key")
+
+def get_upstream_url(service, default=None):
+    """
+    Retrieve the base URL override for an upstream service
+    (openfoodfacts, usda, gemini or news_rss).
+    Prioritizes environment variables, then secrets.toml, then the default.
+    Used to point the backend at local stand-ins, e.g. for load testing.
+    """
+    env_key = f"{service.upper()}_BASE_URL"
+    if os.environ.get(env_key):
+        return os.environ.get(env_key).rstrip("/")
+
+    url = secrets.get("general", {}).get(f"{service}_base_url")
+    if url:
+        return url.rstrip("/")
+    return default
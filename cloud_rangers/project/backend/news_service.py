@@ -1,9 +1,30 @@
 # news_service.py
-import feedparser
-from bs4 import BeautifulSoup
+import logging
 from urllib.parse import quote_plus
 import requests
 from datetime import datetime, timedelta
+from config import get_upstream_url
+from utils.quota import quota_manager, QuotaExceeded, INTERACTIVE, BATCH
+from utils.product_cache import ProductCache
+from utils.news_filter import (
+    compile_keywords, product_pattern, keyword_score, recency_weight, collapse_near_duplicates
+)
+
+logger = logging.getLogger(__name__)
+
+NEWS_RSS_URL = get_upstream_url("news_rss", "https://news.google.com/rss/search")
+FDA_RECALLS_RSS_URL = get_upstream_url(
+    "fda_recalls", "https://www.fda.gov/about-fda/contact-fda/stay-informed/rss-feeds/recalls/rss.xml"
+)
+
+# Google News queries crawled in the background for the recall index
+RECALL_NEWS_QUERIES = {
+    "fssai_alerts": 'FSSAI recall OR ban OR alert OR unsafe',
+    "food_recalls": 'food recall OR "recalled" contamination OR salmonella OR listeria',
+}
+
+# og:image lookups per article URL ("" = page had no image), so each page is scraped once
+ARTICLE_IMAGE_CACHE = ProductCache(max_entries=20000, ttl=7 * 24 * 3600)
 
 FALLBACK_IMAGE = "https://images.unsplash.com/photo-1606787366850-de6330128bfc?w=800&q=80"
 
@@ -25,6 +46,17 @@ SAFETY_KEYWORDS = [
     "quality test"
 ]
 
+# Strong recall signals count more when ranking; other keywords weigh 1
+SAFETY_KEYWORD_WEIGHTS = {
+    "recall": 3, "recalled": 3,
+    "contamination": 2, "contaminated": 2,
+    "banned": 2, "unsafe": 2,
+    "salmonella": 2.5, "listeria": 2.5,
+    "food poisoning": 2.5,
+    "fssai": 1.5, "fda": 1.5,
+}
+SAFETY_PATTERN = compile_keywords(SAFETY_KEYWORDS)
+
 FOOD_CONTEXT_KEYWORDS = [
     "food","noodles","chocolate","milk","biscuit","snack","drink",
     "beverage","product","brand","pack","fssai","fda","factory",
@@ -34,20 +66,19 @@ FOOD_CONTEXT_KEYWORDS = [
 # -----------------------------
 # Helper functions
 # -----------------------------
+def entry_text(entry):
+    return f"{getattr(entry, 'title', '')} {getattr(entry, 'summary', '')}"
+
 def is_product_specific(entry, product_name):
-    text = ""
-    if hasattr(entry, "title"):
-        text += entry.title.lower()
-    if hasattr(entry, "summary"):
-        text += entry.summary.lower()
-
-    product_name = product_name.lower().strip()
-    # check if any word from product_name is in text
-    if not any(word in text for word in product_name.split()):
+    text = entry_text(entry)
+
+    # any word from product_name, as a whole word
+    pattern = product_pattern(product_name.strip())
+    if pattern is None or not pattern.search(text):
         return False
 
     # keep safety keywords check
-    if not any(keyword in text for keyword in SAFETY_KEYWORDS):
+    if not SAFETY_PATTERN.search(text):
         return False
 
     # make FOOD_CONTEXT_KEYWORDS optional
@@ -66,6 +97,15 @@ def parse_article_date(entry):
         pass
     return None
 
+def relevance_score(entry, now=None):
+    """
+    Safety keyword weight, discounted by article age (undated articles
+    count as two weeks old).
+    """
+    date = parse_article_date(entry)
+    age_days = ((now or datetime.now()) - date).days if date else 14
+    return keyword_score(entry_text(entry), SAFETY_PATTERN, SAFETY_KEYWORD_WEIGHTS) * recency_weight(age_days)
+
 def is_recent(entry, days=30):
     date = parse_article_date(entry)
     if not date:
@@ -85,6 +125,7 @@ def extract_thumbnail(entry):
         pass
     try:
         if hasattr(entry, "summary"):
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(entry.summary, "html.parser")
             img = soup.find("img")
             if img:
@@ -94,9 +135,19 @@ def extract_thumbnail(entry):
     return None
 
 def extract_image_from_article(url):
+    cached = ARTICLE_IMAGE_CACHE.get(url)
+    if cached is not None:
+        return cached or None
+    image = scrape_article_image(url)
+    # Pages without an image (or that failed to load) are retried after an hour
+    ARTICLE_IMAGE_CACHE.set(url, image or "", ttl=None if image else 3600)
+    return image
+
+def scrape_article_image(url):
     try:
         headers = {"User-Agent": "Mozilla/5.0"}
         r = requests.get(url, headers=headers, timeout=5)
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(r.text, "html.parser")
         og = soup.find("meta", property="og:image")
         if og and og.get("content"):
@@ -134,13 +185,14 @@ def format_date(date):
 # -----------------------------
 # Main function to fetch news
 # -----------------------------
-def fetch_product_news(product_name, max_articles=10):
+def fetch_product_news(product_name, max_articles=10, priority=INTERACTIVE):
     """
     Fetch news articles related to a product's safety from Google News RSS.
     
     Args:
         product_name (str): Name of the product to search for.
         max_articles (int): Maximum number of articles to return.
+        priority (int): Place in the news feed's quota line (see utils.quota).
 
     Returns:
         list[dict]: List of article dictionaries with title, link, source, thumbnail, and date.
@@ -150,26 +202,31 @@ def fetch_product_news(product_name, max_articles=10):
     # Prepare RSS query
     # -----------------------------
     query = f'{product_name} recall OR contamination OR banned OR unsafe OR warning OR FSSAI OR FDA OR mislabel OR "health risk"'
-    rss_url = f"https://news.google.com/rss/search?q={quote_plus(query)}&hl=en-IN&gl=IN&ceid=IN:en"
+    rss_url = f"{NEWS_RSS_URL}?q={quote_plus(query)}&hl=en-IN&gl=IN&ceid=IN:en"
 
     # -----------------------------
     # Parse RSS feed
     # -----------------------------
+    import feedparser
+    quota_manager.acquire("news_rss", priority)
     feed = feedparser.parse(rss_url)
-    print(f"RSS entries fetched: {len(feed.entries)}")
-    for entry in feed.entries[:5]:  # show first 5 for quick debug
-        print("Title:", entry.title)
+    if getattr(feed, "status", None) == 429:
+        quota_manager.report_quota_error("news_rss")
+        raise QuotaExceeded("news_rss")
+    logger.debug("RSS entries fetched", extra={"product": product_name, "entries": len(feed.entries)})
 
     # -----------------------------
-    # Process entries
+    # Filter and rank entries
     # -----------------------------
-    articles = []
+    candidates = []
     seen = set()
+    now = datetime.now()
 
     for entry in feed.entries:
         link = entry.link
         if link in seen:
             continue
+        seen.add(link)
         if not is_recent(entry):
             continue
         if not is_product_specific(entry, product_name):
@@ -180,25 +237,69 @@ def fetch_product_news(product_name, max_articles=10):
         source = parts[-1] if len(parts) > 1 else "News"
         title = " - ".join(parts[:-1]) if len(parts) > 1 else entry.title
 
-        article = {
-            "title": title.strip(),
-            "link": link.strip(),
-            "source": source.strip(),
-            "thumbnail": resolve_image(entry, link),
+        candidates.append((relevance_score(entry, now), title.strip(), source.strip(), entry))
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    # The same story syndicated by several outlets is shown once (best ranked copy)
+    candidates = collapse_near_duplicates(candidates, lambda c: c[1])[:max_articles]
+
+    # Images are resolved only for the articles we return
+    return [
+        {
+            "title": title,
+            "link": entry.link.strip(),
+            "source": source,
+            "thumbnail": resolve_image(entry, entry.link),
             "date": parse_article_date(entry)
         }
+        for _, title, source, entry in candidates
+    ]
 
-        articles.append(article)
-        seen.add(link)
 
-        if len(articles) >= max_articles:
-            break
+# -----------------------------
+# Recall feeds (background crawler)
+# -----------------------------
+def fetch_recall_feed(url, quota=None):
+    """
+    Parses a recall/safety RSS feed into {title, link, source, date} dicts
+    (date as ISO string or None). `quota` names the upstream quota to wait
+    for, at background priority.
+    """
+    import feedparser
+    if quota:
+        quota_manager.acquire(quota, BATCH)
+    feed = feedparser.parse(url)
+    if getattr(feed, "status", None) == 429:
+        if quota:
+            quota_manager.report_quota_error(quota)
+        raise QuotaExceeded(quota or url)
 
-    return articles
+    entries = []
+    for entry in feed.entries:
+        if not getattr(entry, "link", None) or not getattr(entry, "title", None):
+            continue
+        parts = entry.title.split(" - ")
+        date = parse_article_date(entry)
+        entries.append({
+            "title": (" - ".join(parts[:-1]) if len(parts) > 1 else entry.title).strip(),
+            "link": entry.link.strip(),
+            "source": parts[-1].strip() if len(parts) > 1 else getattr(feed.feed, "title", "News"),
+            "date": date.isoformat() if date else None,
+        })
+    return entries
 
+def recall_feeds():
+    """
+    The feeds the recall crawler ingests, as name -> fetch callable.
+    """
+    feeds = {"fda_recalls": lambda: fetch_recall_feed(FDA_RECALLS_RSS_URL)}
+    for name, query in RECALL_NEWS_QUERIES.items():
+        url = f"{NEWS_RSS_URL}?q={quote_plus(query)}&hl=en-IN&gl=IN&ceid=IN:en"
+        feeds[name] = lambda url=url: fetch_recall_feed(url, quota="news_rss")
+    return feeds
 
-def get_safety_news(product_name, max_articles=10):
-    articles = fetch_product_news(product_name, max_articles)
+def get_safety_news(product_name, max_articles=10, priority=INTERACTIVE):
+    articles = fetch_product_news(product_name, max_articles, priority)
     formatted = []
     for a in articles:
         formatted.append({
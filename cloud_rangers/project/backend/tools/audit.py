@@ -0,0 +1,265 @@
+"""
+Resumable bulk catalog audit.
+
+Streams barcodes from a CSV (a `barcode` column, or the first column) or
+JSONL file (objects with a `barcode` key, or bare strings), runs the full
+lookup + analysis pipeline with bounded concurrency behind the shared
+upstream quotas, and appends one result per barcode to a JSONL or CSV file.
+
+The output file doubles as the checkpoint: when re-run with the same
+output, barcodes already audited as "ok" or "not_found" are skipped, and
+failed ones are retried (the latest line for a barcode wins).
+
+Run from the backend directory:
+    python -m tools.audit catalog.csv audit.jsonl --concurrency 16
+    python -m tools.audit catalog.jsonl audit.csv --openfoodfacts-rpm 90
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.product_lookup import lookup_product
+from utils.data_processor import normalize_product_data
+from utils.risk_engine import load_banned_ingredients, rules_version
+from utils.analysis import analyze_product, ANALYSIS_FIELDS
+from utils.quota import quota_manager, BATCH
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BANNED_DB_PATH = os.path.join(BACKEND_DIR, "data", "banned_ingredients.csv")
+
+OUTPUT_FIELDS = (
+    "barcode", "status", "name", "brand", "source", "health_score", "risk_count",
+    "risks", "nova_group", "nutriscore_grade", "rules_version", "error",
+)
+FINAL_STATUSES = ("ok", "not_found")
+
+
+def file_format(path, override=None):
+    if override:
+        return override
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_barcodes(path, fmt):
+    """
+    Yields barcodes from a CSV or JSONL file without loading it into memory.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            column = 0
+            if "barcode" in [h.strip().lower() for h in header]:
+                column = [h.strip().lower() for h in header].index("barcode")
+            elif header and header[0].strip().isdigit():
+                yield header[0].strip()
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    yield row[column].strip()
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    value = json.loads(line)
+                except ValueError:
+                    value = line
+                if isinstance(value, dict):
+                    value = value.get("barcode") or value.get("code")
+                if value:
+                    yield str(value).strip()
+
+
+def load_checkpoint(path, fmt):
+    """
+    Returns the barcodes already audited with a final status. A partial last
+    line (from a crash mid-write) is cut off so appends start on a clean line.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    text = data[:end].decode("utf-8")
+
+    if fmt == "csv":
+        rows = csv.DictReader(text.splitlines())
+    else:
+        rows = []
+        for line in text.splitlines():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    for row in rows:
+        if row.get("status") in FINAL_STATUSES:
+            done.add(row["barcode"])
+        else:
+            done.discard(row.get("barcode"))
+    return done
+
+
+class ResultWriter:
+    """
+    Appends results to the output file, flushing each one so progress
+    survives a crash.
+    """
+    def __init__(self, path, fmt):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.fmt = fmt
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = None
+        if fmt == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, result):
+        if self.fmt == "csv":
+            self.writer.writerow(dict(result, risks=json.dumps(result.get("risks") or [])))
+        else:
+            self.file.write(json.dumps(result, default=str) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def audit_barcode(barcode, banned_df, version):
+    """
+    Runs the lookup + analysis pipeline for one barcode.
+    """
+    result = {"barcode": barcode, "rules_version": version}
+    try:
+        raw_data = lookup_product(barcode, BATCH)
+        if not raw_data:
+            return dict(result, status="not_found")
+        product = normalize_product_data(raw_data)
+        analysis = analyze_product(product, banned_df, ("name", "brand", "source", "nova_group", "nutriscore_grade") + ANALYSIS_FIELDS)
+        analysis.pop("parsed_ingredients", None)
+        return dict(result, status="ok", risk_count=len(analysis["risks"]), **analysis)
+    except Exception as e:
+        return dict(result, status="error", error=f"{type(e).__name__}: {e}")
+
+
+class Progress:
+    def __init__(self, total, already_done, interval):
+        self.total = total
+        self.already_done = already_done
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.counts = {"ok": 0, "not_found": 0, "error": 0}
+
+    def add(self, status, force=False):
+        if status:
+            self.counts[status] += 1
+        now = time.monotonic()
+        if force or now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now):
+        processed = sum(self.counts.values())
+        elapsed = max(now - self.start, 1e-9)
+        rate = processed / elapsed
+        remaining = self.total - self.already_done - processed
+        eta = remaining / rate if rate > 0 else float("inf")
+        print(
+            f"[{elapsed:7.0f}s] {self.already_done + processed}/{self.total} "
+            f"(ok {self.counts['ok']}, not found {self.counts['not_found']}, errors {self.counts['error']}) "
+            f"{rate:.1f}/s, ETA {format_duration(eta)}",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def format_duration(seconds):
+    if seconds == float("inf"):
+        return "unknown"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}h{rest // 60:02d}m{rest % 60:02d}s"
+
+
+async def run_audit(args):
+    in_fmt = file_format(args.input, args.input_format)
+    out_fmt = file_format(args.output, args.output_format)
+
+    done = load_checkpoint(args.output, out_fmt)
+    total = len(set(iter_barcodes(args.input, in_fmt)))
+    progress = Progress(total, len(done), args.progress_interval)
+    print(f"Auditing {total} barcodes ({len(done)} already done) from {args.input} -> {args.output}", file=sys.stderr)
+
+    # Blocking lookups run in threads; size the pool to the concurrency limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(args.concurrency))
+    banned_df = load_banned_ingredients(BANNED_DB_PATH)
+    version = rules_version(BANNED_DB_PATH)
+    writer = ResultWriter(args.output, out_fmt)
+    pending = set()
+    seen = set()
+    try:
+        for barcode in iter_barcodes(args.input, in_fmt):
+            if barcode in done or barcode in seen:
+                continue
+            seen.add(barcode)
+            if len(pending) >= args.concurrency:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    result = task.result()
+                    writer.write(result)
+                    progress.add(result["status"])
+            pending.add(asyncio.ensure_future(asyncio.to_thread(audit_barcode, barcode, banned_df, version)))
+
+        for task in asyncio.as_completed(pending):
+            result = await task
+            writer.write(result)
+            progress.add(result["status"])
+        pending = set()
+    finally:
+        # Interrupted: whatever finished is already on disk; the rest is redone on resume
+        for task in pending:
+            task.cancel()
+        writer.close()
+        progress.add(None, force=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit a catalog of barcodes against the risk rules.")
+    parser.add_argument("input", help="CSV or JSONL file of barcodes")
+    parser.add_argument("output", help="JSONL or CSV results file (also the resume checkpoint)")
+    parser.add_argument("--input-format", choices=("csv", "jsonl"))
+    parser.add_argument("--output-format", choices=("csv", "jsonl"))
+    parser.add_argument("--concurrency", type=int, default=8, help="lookups in flight")
+    parser.add_argument("--openfoodfacts-rpm", type=float, help="override the OpenFoodFacts requests/minute quota")
+    parser.add_argument("--usda-rpm", type=float, help="override the USDA requests/minute quota")
+    parser.add_argument("--progress-interval", type=float, default=10, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    if args.openfoodfacts_rpm:
+        quota_manager.configure("openfoodfacts", args.openfoodfacts_rpm)
+    if args.usda_rpm:
+        quota_manager.configure("usda", args.usda_rpm)
+
+    try:
+        asyncio.run(run_audit(args))
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume.", file=sys.stderr)
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Reports over the analysis history written by the API (utils.history).
+
+Run from the backend directory:
+    python -m tools.history_report top-risks --days 30
+    python -m tools.history_report daily --days 7 --json
+    python -m tools.history_report top-risks --dir /var/lib/app/history --limit 50
+"""
+import argparse
+import json
+import os
+import sys
+
+from utils.history import top_risks, daily_summary, last_days
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY_DIR = os.environ.get("HISTORY_DIR", os.path.join(BACKEND_DIR, "data", "history"))
+
+
+def print_table(rows):
+    if not rows:
+        print("No history in this range.")
+        return
+    columns = list(rows[0])
+    cells = [[format_cell(r[c]) for c in columns] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def format_cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the analysis history.")
+    parser.add_argument("report", choices=("top-risks", "daily"))
+    parser.add_argument("--dir", default=DEFAULT_HISTORY_DIR, help="history directory (default: $HISTORY_DIR)")
+    parser.add_argument("--days", type=int, default=30, help="days to cover, today included")
+    parser.add_argument("--limit", type=int, default=20, help="rows for top-risks")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    start, end = last_days(args.days)
+    if args.report == "top-risks":
+        rows = top_risks(args.dir, start, end, args.limit)
+    else:
+        rows = daily_summary(args.dir, start, end)
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
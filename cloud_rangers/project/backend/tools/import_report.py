@@ -0,0 +1,98 @@
+"""
+Startup-time report: breaks down the import cost of a module by package.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+aggregates the per-module self time by top-level package, so it is easy to
+see which dependencies a cold start pays for.
+
+Run from the backend directory:
+    python -m tools.import_report                 # the FastAPI app
+    python -m tools.import_report --module utils.product_lookup --top 15
+    python -m tools.import_report --cwd ../food_analysis --module utils.risk_engine
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time:       123 |        456 |     package.module
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_imports(module, cwd=BACKEND_DIR, python=sys.executable):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+    Returns (wall_seconds, entries) where entries is a list of
+    (module_name, self_us, cumulative_us, depth).
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"Importing {module} failed:\n{tail}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return wall, entries
+
+
+def summarize_by_package(entries):
+    """
+    Sums self time per top-level package. Self time is attributed to the
+    package that owns each module, so nested imports of other packages are
+    counted under those packages rather than double counted.
+    Returns a list of (package, self_us, module_count), most expensive first.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for name, self_us, _, _ in entries:
+        package = name.split(".")[0]
+        totals[package][0] += self_us
+        totals[package][1] += 1
+    return sorted(((pkg, us, count) for pkg, (us, count) in totals.items()), key=lambda row: -row[1])
+
+
+def print_report(module, wall, entries, top=25):
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    print(f"Startup import report for '{module}'")
+    print(f"Interpreter wall time: {wall * 1000:.0f} ms, measured import time: {total_us / 1000:.0f} ms, "
+          f"{len(entries)} modules\n")
+
+    header = f"{'package':<32}{'self ms':>10}{'share':>8}{'modules':>9}"
+    print(header)
+    print("-" * len(header))
+    for package, self_us, count in summarize_by_package(entries)[:top]:
+        share = self_us / total_us * 100 if total_us else 0
+        print(f"{package:<32}{self_us / 1000:>10.1f}{share:>7.1f}%{count:>9}")
+
+    print("\nSlowest individual imports (cumulative):")
+    slowest = sorted(entries, key=lambda e: -e[2])[:top]
+    for name, _, cumulative_us, depth in slowest:
+        print(f"{cumulative_us / 1000:>10.1f} ms  {'  ' * depth}{name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Break down import cost by package.")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--cwd", default=BACKEND_DIR, help="Directory to import from")
+    parser.add_argument("--top", type=int, default=25, help="Rows to show per table")
+    args = parser.parse_args(argv)
+
+    wall, entries = measure_imports(args.module, cwd=args.cwd)
+    print_report(args.module, wall, entries, args.top)
+
+
+if __name__ == "__main__":
+    main()
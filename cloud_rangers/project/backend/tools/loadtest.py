@@ -0,0 +1,282 @@
+"""
+Self-contained load harness for the backend.
+
+Starts the local upstream stand-ins from tools.mock_upstreams, launches
+`app:app` under uvicorn pointed at them through the {SERVICE}_BASE_URL
+environment variables, drives a mixed product/analyze/news workload and
+reports throughput and p50/p95/p99 latency per route.
+
+Run from the backend directory:
+    python -m tools.loadtest --duration 60 --concurrency 32 --workers 2
+    python -m tools.loadtest --mix product=8,analyze=1,news=1 --error-rate 0.02 --json report.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from .mock_upstreams import build_arg_parser, configs_from_args, start_mock_upstreams, stop_mock_upstreams
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {"product": 7, "analyze": 2, "news": 1}
+
+
+def parse_mix(value):
+    """
+    Parses "product=7,analyze=2,news=1" into a weight dict.
+    """
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown route '{name}', expected one of {list(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def make_barcodes(count, seed=42):
+    rng = random.Random(seed)
+    return [str(rng.randint(10**12, 10**13 - 1)) for _ in range(count)]
+
+
+class Workload:
+    """
+    Generates requests for the mixed workload. Barcodes follow a skewed
+    (Zipf-like) popularity so caches see a realistic hit pattern.
+    """
+    def __init__(self, base_url, mix, barcodes, zipf_s=1.1):
+        self.base_url = base_url
+        self.routes = list(mix)
+        self.weights = [mix[r] for r in self.routes]
+        self.barcodes = barcodes
+        self.barcode_weights = [1 / (rank ** zipf_s) for rank in range(1, len(barcodes) + 1)]
+
+    def pick_barcode(self, rng):
+        return rng.choices(self.barcodes, self.barcode_weights)[0]
+
+    def run_one(self, session, rng):
+        route = rng.choices(self.routes, self.weights)[0]
+        barcode = self.pick_barcode(rng)
+        start = time.perf_counter()
+        try:
+            if route == "product":
+                response = session.get(f"{self.base_url}/api/product/{barcode}", timeout=60)
+            elif route == "analyze":
+                response = session.post(f"{self.base_url}/api/analyze", timeout=120, json={
+                    "product_name": f"Product {barcode[-4:]}",
+                    "ingredients": ["water", "sugar", "red 40", "salt"],
+                    "risks": [{"ingredient": "Red 40", "risk_level": "High", "found_as": "red 40"}],
+                })
+            else:
+                response = session.post(f"{self.base_url}/api/news", timeout=120, json={
+                    "product_name": f"Cola {barcode[-4:]}",
+                })
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return route, time.perf_counter() - start, status
+
+
+def drive(workload, duration, concurrency, seed=0):
+    """
+    Runs `concurrency` closed-loop clients for `duration` seconds.
+    Returns (samples, elapsed) where samples is a list of (route, seconds, status).
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            local.append(workload.run_one(session, rng))
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """
+    Aggregates samples into per-route throughput and latency percentiles (ms).
+    """
+    by_route = defaultdict(list)
+    for route, seconds, status in samples:
+        by_route[route].append((seconds, status))
+    by_route["all"] = [(seconds, status) for _, seconds, status in samples]
+
+    report = {}
+    for route, entries in by_route.items():
+        ok = sorted(s for s, status in entries if status is not None and status < 500)
+        report[route] = {
+            "requests": len(entries),
+            "errors": len(entries) - len(ok),
+            "throughput_rps": round(len(entries) / elapsed, 2) if elapsed else 0,
+            "p50_ms": _ms(percentile(ok, 50)),
+            "p95_ms": _ms(percentile(ok, 95)),
+            "p99_ms": _ms(percentile(ok, 99)),
+            "max_ms": _ms(ok[-1] if ok else None),
+        }
+    return report
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def print_report(report, elapsed):
+    print(f"\nDuration: {elapsed:.1f}s")
+    header = f"{'route':<10}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for route in sorted(report, key=lambda r: (r == "all", r)):
+        row = report[route]
+        print(
+            f"{route:<10}{row['requests']:>8}{row['errors']:>8}{row['throughput_rps']:>10}"
+            f"{_fmt(row['p50_ms']):>10}{_fmt(row['p95_ms']):>10}{_fmt(row['p99_ms']):>10}{_fmt(row['max_ms']):>10}"
+        )
+
+
+def _fmt(value):
+    return "-" if value is None else value
+
+
+def start_backend(urls, port, workers, state_dir, extra_env=None):
+    """
+    Launches the backend under uvicorn with every upstream pointed at the
+    stand-ins and all of its on-disk state (jobs, popular barcodes, image
+    cache, history) kept in `state_dir`, away from the real data files.
+    """
+    env = dict(os.environ)
+    env.update({f"{service.upper()}_BASE_URL": url for service, url in urls.items()})
+    env.update({
+        "JOBS_DB_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "POPULAR_BARCODES_PATH": os.path.join(state_dir, "popular_barcodes.json"),
+        "IMAGE_CACHE_DIR": os.path.join(state_dir, "image_cache"),
+        "HISTORY_DIR": os.path.join(state_dir, "history"),
+    })
+    # The recall crawler talks to real feeds that have no stand-in
+    env.setdefault("RECALL_CRAWL_INTERVAL_S", "0")
+    # The stand-ins have no rate limits; the production quotas would make
+    # this measure the limiter instead of the backend (0 = unlimited)
+    for service in urls:
+        env.setdefault(f"{service.upper()}_REQUESTS_PER_MINUTE", "0")
+    env.setdefault("GEMINI_API_KEY", "mock-key")
+    env.setdefault("USDA_API_KEY", "mock-key")
+    env.update(extra_env or {})
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+
+
+def wait_until_ready(base_url, process=None, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Backend exited during startup with code {process.returncode}")
+        try:
+            requests.get(f"{base_url}/openapi.json", timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.25)
+    raise RuntimeError(f"Backend at {base_url} did not become ready within {timeout}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the backend against local upstream stand-ins.")
+    build_arg_parser(parser)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to drive load for")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of unrecorded load before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of closed-loop clients")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the backend under test")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Route weights, e.g. product=7,analyze=2,news=1")
+    parser.add_argument("--barcodes", type=int, default=500, help="Size of the barcode population")
+    parser.add_argument("--target", default=None,
+                        help="Use an already running backend at this URL instead of launching one")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    servers, urls = start_mock_upstreams(configs_from_args(args))
+    process = None
+    state_dir = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+            print("Stand-in URLs (export these for the target backend):")
+            for service, url in urls.items():
+                print(f"  {service.upper()}_BASE_URL={url}")
+                print(f"  {service.upper()}_REQUESTS_PER_MINUTE=0")
+        else:
+            base_url = f"http://127.0.0.1:{args.port}"
+            state_dir = tempfile.mkdtemp(prefix="loadtest-")
+            process = start_backend(urls, args.port, args.workers, state_dir)
+        wait_until_ready(base_url, process)
+
+        workload = Workload(base_url, args.mix, make_barcodes(args.barcodes))
+        if args.warmup > 0:
+            print(f"Warming up for {args.warmup:.0f}s...")
+            drive(workload, args.warmup, args.concurrency, seed=10_000)
+
+        print(f"Driving {args.concurrency} clients for {args.duration:.0f}s, mix={args.mix}")
+        samples, elapsed = drive(workload, args.duration, args.concurrency)
+        report = summarize(samples, elapsed)
+        print_report(report, elapsed)
+
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "duration_s": round(elapsed, 2),
+                    "concurrency": args.concurrency,
+                    "workers": args.workers,
+                    "mix": args.mix,
+                    "upstream_latency_ms": args.latency_ms,
+                    "upstream_error_rate": args.error_rate,
+                    "routes": report,
+                }, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        stop_mock_upstreams(servers)
+        if state_dir is not None:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Local stand-ins for the upstream services the backend talks to:
+OpenFoodFacts, USDA FoodData Central, Gemini (REST) and Google News RSS.
+
+Each stand-in serves deterministic synthetic data with configurable
+latency and error injection, so the backend can be load tested without
+touching (or being rate limited by) the real providers.
+
+Run standalone with:
+    python -m tools.mock_upstreams --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+SERVICES = ("openfoodfacts", "usda", "gemini", "news_rss")
+
+# Ingredient pools used to build synthetic products. A share of products pick
+# up entries from banned_ingredients.csv so the risk engine does real work.
+SAFE_INGREDIENTS = [
+    "water", "sugar", "wheat flour", "salt", "sunflower oil", "milk powder",
+    "cocoa butter", "rice", "tomato paste", "yeast", "citric acid", "vanilla extract",
+]
+RISKY_INGREDIENTS = [
+    "red 40", "yellow 5", "titanium dioxide", "brominated vegetable oil",
+    "potassium bromate", "bha", "carrageenan",
+]
+# OpenFoodFacts additive tags for the risky ingredients above
+ADDITIVE_TAGS = {
+    "red 40": "en:e129", "yellow 5": "en:e102", "titanium dioxide": "en:e171",
+    "brominated vegetable oil": "en:e443", "potassium bromate": "en:e924",
+    "bha": "en:e320", "carrageenan": "en:e407", "citric acid": "en:e330",
+}
+PRODUCT_WORDS = ["choco", "crunch", "noodles", "cola", "biscuit", "yogurt", "chips", "cereal"]
+
+
+class UpstreamConfig:
+    """
+    Latency and error injection settings for a single stand-in.
+    """
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, error_status=503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def delay(self):
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        time.sleep(max(0, self.latency_ms + jitter) / 1000)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+def synthetic_product(barcode):
+    """
+    Builds a deterministic OpenFoodFacts-style product for a barcode.
+    """
+    rng = random.Random(barcode)
+    ingredients = rng.sample(SAFE_INGREDIENTS, rng.randint(3, 8))
+    if rng.random() < 0.4:
+        ingredients += rng.sample(RISKY_INGREDIENTS, rng.randint(1, 2))
+    name = f"{rng.choice(PRODUCT_WORDS).title()} {barcode[-4:]}"
+    return {
+        "code": barcode,
+        "product_name": name,
+        "brands": f"Brand {barcode[-2:]}",
+        "ingredients_text": ", ".join(ingredients),
+        "ingredients": [{"id": f"en:{i.replace(' ', '-')}", "text": i} for i in ingredients],
+        "additives_tags": [ADDITIVE_TAGS[i] for i in ingredients if i in ADDITIVE_TAGS],
+        "image_url": f"https://images.example.com/{barcode}.jpg",
+        "nutriments": {
+            "sugars_100g": round(rng.uniform(0, 40), 1),
+            "saturated-fat_100g": round(rng.uniform(0, 15), 1),
+            "salt_100g": round(rng.uniform(0, 2), 2),
+            "fiber_100g": round(rng.uniform(0, 8), 1),
+            "proteins_100g": round(rng.uniform(0, 20), 1),
+        },
+        "categories": rng.choice(["Snacks, Sweet snacks", "Beverages, Sodas", "Breakfasts, Cereals"]),
+        "nova_group": rng.randint(1, 4),
+        "nutriscore_grade": rng.choice("abcde"),
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    Base handler applying latency and error injection before routing.
+    Subclasses implement route(method, path, query, body).
+    """
+    config = UpstreamConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the harness output
+        pass
+
+    def _handle(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.config.delay()
+        if self.config.should_fail():
+            return self.send_payload(self.config.error_status, {"error": "injected failure"})
+
+        parsed = urlparse(self.path)
+        try:
+            self.route(method, parsed.path, parse_qs(parsed.query), body)
+        except Exception as e:
+            self.send_payload(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def route(self, method, path, query, body):
+        self.send_payload(404, {"error": "not found"})
+
+    def send_payload(self, status, payload, content_type="application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OpenFoodFactsStandIn(MockHandler):
+    def route(self, method, path, query, body):
+        match = re.match(r"^/api/v[0-9]+/product/([^/.]+)(?:\.json)?$", path)
+        if not match:
+            return super().route(method, path, query, body)
+        barcode = match.group(1)
+        # Barcodes ending in 0 are "unknown" so the USDA fallback path gets exercised
+        if barcode.endswith("0"):
+            return self.send_payload(200, {"code": barcode, "status": 0, "status_verbose": "product not found"})
+        product = synthetic_product(barcode)
+        # Honour field projection like the real API (?fields=a,b,c)
+        if query.get("fields"):
+            fields = set(query["fields"][0].split(","))
+            product = {k: v for k, v in product.items() if k in fields}
+        self.send_payload(200, {"code": barcode, "status": 1, "product": product})
+
+
+class USDAStandIn(MockHandler):
+    def route(self, method, path, query, body):
+        if path.endswith("/foods/search"):
+            term = query.get("query", [""])[0]
+            return self.send_payload(200, {"foods": [{"fdcId": zlib.crc32(term.encode("utf-8")) % 10**6, "description": term}]})
+
+        match = re.search(r"/food/([0-9]+)$", path)
+        if match:
+            product = synthetic_product(match.group(1).zfill(6))
+            return self.send_payload(200, {
+                "fdcId": int(match.group(1)),
+                "description": product["product_name"],
+                "brandOwner": product["brands"],
+                "ingredients": product["ingredients_text"],
+                "foodCategory": "Snacks",
+                "foodNutrients": [
+                    {"nutrientName": "Sugars, total", "value": product["nutriments"]["sugars_100g"]},
+                    {"nutrientName": "Protein", "value": product["nutriments"]["proteins_100g"]},
+                    {"nutrientName": "Sodium, Na", "value": 400},
+                ],
+            })
+        super().route(method, path, query, body)
+
+
+class GeminiStandIn(MockHandler):
+    def route(self, method, path, query, body):
+        if method != "POST" or ":generateContent" not in path:
+            return super().route(method, path, query, body)
+        request = json.loads(body or b"{}")
+        prompt = ""
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                prompt += part.get("text", "")
+        text = (
+            "**Overall:** Consume in Moderation.\n\n"
+            f"- Mock analysis of a {len(prompt)}-character prompt.\n"
+            "- Flagged ingredients are explained here by the stand-in model."
+        )
+        self.send_payload(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        })
+
+
+class NewsRSSStandIn(MockHandler):
+    def route(self, method, path, query, body):
+        if path.startswith("/article/"):
+            host = self.headers.get("Host", "localhost")
+            html = (
+                "<html><head>"
+                f'<meta property="og:image" content="http://{host}/images{path}.jpg">'
+                "</head><body>Mock article</body></html>"
+            )
+            return self.send_payload(200, html.encode("utf-8"), "text/html")
+
+        if not path.endswith("/search") and path != "/rss/search":
+            return super().route(method, path, query, body)
+
+        q = query.get("q", [""])[0]
+        product_name = q.split(" recall")[0].strip() or "product"
+        host = self.headers.get("Host", "localhost")
+        now = formatdate(usegmt=True)
+        story_id = zlib.crc32(product_name.encode("utf-8")) % 10**6
+        items = []
+        for i in range(12):
+            items.append(
+                "<item>"
+                f"<title>{escape(product_name)} recall notice {i} issued by FDA - Outlet {i}</title>"
+                f"<link>http://{host}/article/{story_id}-{i}</link>"
+                f"<pubDate>{now}</pubDate>"
+                f"<description>{escape(product_name)} contamination warning for consumers.</description>"
+                "</item>"
+            )
+        rss = (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            "<title>Mock News</title>" + "".join(items) + "</channel></rss>"
+        )
+        self.send_payload(200, rss.encode("utf-8"), "application/rss+xml")
+
+
+HANDLERS = {
+    "openfoodfacts": OpenFoodFactsStandIn,
+    "usda": USDAStandIn,
+    "gemini": GeminiStandIn,
+    "news_rss": NewsRSSStandIn,
+}
+
+
+def start_mock_upstreams(config=None, host="127.0.0.1"):
+    """
+    Starts every stand-in on its own ephemeral port in a background thread.
+    `config` maps service name to UpstreamConfig (missing services use defaults).
+    Returns (servers, urls) where urls maps service name to the base URL to
+    export as {SERVICE}_BASE_URL.
+    """
+    config = config or {}
+    servers = {}
+    urls = {}
+    for service in SERVICES:
+        handler = type(HANDLERS[service].__name__, (HANDLERS[service],), {
+            "config": config.get(service, UpstreamConfig()),
+        })
+        server = ThreadingHTTPServer((host, 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers[service] = server
+        base = f"http://{host}:{server.server_address[1]}"
+        urls[service] = base + "/rss/search" if service == "news_rss" else base
+    return servers, urls
+
+
+def stop_mock_upstreams(servers):
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def build_arg_parser(parser=None):
+    parser = parser or argparse.ArgumentParser(description="Run local upstream stand-ins.")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mean injected latency per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Uniform +/- jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with an error")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status used for injected errors")
+    parser.add_argument("--gemini-latency-ms", type=float, default=None,
+                        help="Override latency for the Gemini stand-in (LLM calls are much slower)")
+    return parser
+
+
+def configs_from_args(args):
+    config = {
+        service: UpstreamConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+        for service in SERVICES
+    }
+    if args.gemini_latency_ms is not None:
+        config["gemini"] = UpstreamConfig(args.gemini_latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    return config
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    servers, urls = start_mock_upstreams(configs_from_args(args))
+    for service, url in urls.items():
+        print(f"export {service.upper()}_BASE_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_mock_upstreams(servers)
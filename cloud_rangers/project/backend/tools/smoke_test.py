@@ -0,0 +1,176 @@
+"""
+End-to-end smoke check of the API against the local upstream stand-ins.
+
+Starts tools.mock_upstreams, points the backend at them through the
+{SERVICE}_BASE_URL environment variables, keeps all state (jobs database,
+caches, history) in a temporary directory, and drives the app in-process
+with FastAPI's TestClient. Each check prints PASS or FAIL; the exit code is
+the number of failed checks.
+
+Run from the backend directory:
+    python -m tools.smoke_test
+    python -m tools.smoke_test --only product
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+from .mock_upstreams import UpstreamConfig, SERVICES, start_mock_upstreams, stop_mock_upstreams
+
+# Synthetic products are deterministic per barcode
+BARCODES = ["8901234567890", "8901234567891", "8901234567892"]
+# Written to POPULAR_BARCODES_PATH, so startup warm-up prefetches them
+POPULAR = ["8901234567990", "8901234567991"]
+
+# Imported from CATALOG_PATH at startup: one worse and two better granolas
+CATALOG = [
+    {"code": "9900000000001", "product_name": "Sugar Bomb Granola", "brands": "Smoketest Farms",
+     "ingredients_text": "oats, sugar, red 40", "categories": "Breakfasts, Granolas",
+     "nutriments": {"sugars_100g": 35, "saturated-fat_100g": 6, "fiber_100g": 2}},
+    {"code": "9900000000002", "product_name": "Plain Oat Granola", "brands": "Smoketest Farms",
+     "ingredients_text": "oats, honey", "categories": "Breakfasts, Granolas",
+     "nutriments": {"sugars_100g": 8, "fiber_100g": 9, "proteins_100g": 12}},
+    {"code": "9900000000003", "product_name": "Nut Granola", "brands": "Smoketest Farms",
+     "ingredients_text": "oats, almonds", "categories": "Breakfasts, Granolas",
+     "nutriments": {"sugars_100g": 10, "fiber_100g": 7, "proteins_100g": 15}},
+]
+
+
+def check_product(client, backend):
+    response = client.get(f"/api/product/{BARCODES[0]}")
+    assert response.status_code == 200, f"GET /api/product returned {response.status_code}: {response.text}"
+    body = response.json()
+    assert isinstance(body.get("risks"), list), "response has no risks list"
+    assert body.get("health_score") is not None, "response has no health_score"
+
+
+def check_evaluate(client, backend):
+    # A barcode nobody has fetched yet, so the uncached analysis path runs
+    profiles = [{"name": "kid", "allergies": ["milk"], "conditions": ["diabetes"], "age": 8}, {"name": "adult"}]
+    response = client.post(f"/api/product/{BARCODES[1]}/evaluate", json={"profiles": profiles})
+    assert response.status_code == 200, f"POST evaluate returned {response.status_code}: {response.text}"
+    body = response.json()
+    assert [p["name"] for p in body["profiles"]] == ["kid", "adult"], body
+    assert "risks" in body and "health_score" in body, body
+
+
+def check_catalog(client, backend):
+    # The catalog is imported by a background thread at startup
+    deadline = time.monotonic() + 10
+    while not all(p["code"] in backend.alternatives_index for p in CATALOG):
+        assert time.monotonic() < deadline, "catalog products never reached the alternatives index"
+        time.sleep(0.1)
+
+    response = client.get(f"/api/product/{CATALOG[0]['code']}/alternatives")
+    assert response.status_code == 200, f"alternatives returned {response.status_code}: {response.text}"
+    found = {a["barcode"] for a in response.json()["alternatives"]}
+    assert {CATALOG[1]["code"], CATALOG[2]["code"]} <= found, f"alternatives were {found}"
+
+    response = client.get("/api/search", params={"q": "smoketest granola"})
+    assert response.status_code == 200, f"search returned {response.status_code}: {response.text}"
+    found = {r["barcode"] for r in response.json()["results"]}
+    assert {p["code"] for p in CATALOG} <= found, f"search results were {found}"
+
+
+def check_product_job(client, backend):
+    response = client.post("/api/jobs/product", json={"barcode": BARCODES[2]})
+    assert response.status_code == 202, f"job submission returned {response.status_code}: {response.text}"
+    job_id = response.json()["job_id"]
+
+    job = client.get(f"/api/jobs/{job_id}", params={"wait": 20}).json()
+    assert job["status"] == "succeeded", f"product job ended {job['status']}: {job.get('error')}"
+    result = job["result"]
+    assert result["found"] and "risks" in result and "health_score" in result, result
+
+
+def check_scan(client, backend):
+    stages = []
+    with client.websocket_connect("/ws/scan") as ws:
+        ws.send_text(json.dumps({"barcode": BARCODES[0]}))
+        while not stages or stages[-1]["stage"] not in ("done", "error"):
+            stages.append(ws.receive_json())
+    names = [m["stage"] for m in stages]
+    assert names == ["product", "analysis", "explanation", "news", "done"], f"scan stages were {names}: {stages[-1]}"
+    analysis = stages[1]["data"]
+    assert isinstance(analysis["risks"], list) and analysis["health_score"] is not None, analysis
+
+
+def check_warmup(client, backend):
+    deadline = time.monotonic() + 10
+    pending = list(POPULAR)
+    while pending:
+        assert time.monotonic() < deadline, f"warm-up never cached analyses for {pending}"
+        # Only a cache peek: products that are not cached yet are skipped, not fetched
+        pending = [b for b in pending
+                   if b not in backend.product_cache
+                   or backend.cached_analysis(b, backend.product_cache.get(b).to_dict()) is None]
+        time.sleep(0.1)
+
+
+CHECKS = {
+    "product": check_product,
+    "evaluate": check_evaluate,
+    "catalog": check_catalog,
+    "product_job": check_product_job,
+    "scan": check_scan,
+    "warmup": check_warmup,
+}
+
+
+def backend_env(urls, state_dir):
+    env = {f"{service.upper()}_BASE_URL": url for service, url in urls.items()}
+    env.update({
+        # The recall crawler and rules watcher would only add background noise
+        "RECALL_CRAWL_INTERVAL_S": "0",
+        "RULES_RELOAD_INTERVAL_S": "0",
+        "WARMUP_REQUESTS_PER_SECOND": "50",
+        "USDA_API_KEY": "mock-key",
+        "JOBS_DB_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "POPULAR_BARCODES_PATH": os.path.join(state_dir, "popular_barcodes.json"),
+        "IMAGE_CACHE_DIR": os.path.join(state_dir, "image_cache"),
+        "HISTORY_DIR": os.path.join(state_dir, "history"),
+        "CATALOG_PATH": os.path.join(state_dir, "catalog.jsonl"),
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Smoke test the API against local upstream stand-ins.")
+    parser.add_argument("--only", action="append", choices=sorted(CHECKS), help="run only these checks")
+    args = parser.parse_args(argv)
+
+    servers, urls = start_mock_upstreams({s: UpstreamConfig(latency_ms=0, jitter_ms=0) for s in SERVICES})
+    failures = 0
+    try:
+        with tempfile.TemporaryDirectory() as state_dir:
+            env = backend_env(urls, state_dir)
+            with open(env["CATALOG_PATH"], "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(p) + "\n" for p in CATALOG)
+            with open(env["POPULAR_BARCODES_PATH"], "w", encoding="utf-8") as f:
+                json.dump({"top": [{"barcode": b, "count": 1} for b in POPULAR]}, f)
+            os.environ.update(env)
+            # Imported late: the app reads its configuration at import time
+            from fastapi.testclient import TestClient
+            import app as backend
+
+            with TestClient(backend.app) as client:
+                for name in args.only or CHECKS:
+                    try:
+                        CHECKS[name](client, backend)
+                        print(f"PASS  {name}")
+                    except Exception:
+                        failures += 1
+                        print(f"FAIL  {name}")
+                        traceback.print_exc()
+    finally:
+        stop_mock_upstreams(servers)
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import bisect
+import threading
+
+def normalize_categories(categories):
+    """
+    Normalizes the categories produced by normalize_product_data (a list of
+    strings with leading whitespace, or a comma-separated string) into a
+    tuple of lowercase category names without language prefixes.
+    """
+    if isinstance(categories, str):
+        categories = categories.split(",")
+
+    normalized = []
+    for category in categories or ():
+        category = (category or "").strip().lower()
+        # OpenFoodFacts tags look like "en:breakfast-cereals"
+        if len(category) > 3 and category[2] == ":":
+            category = category[3:].replace("-", " ")
+        if category and category not in normalized:
+            normalized.append(category)
+    return tuple(normalized)
+
+def rank_key(health_score, risk_count):
+    """
+    Sort key for a product within a category: higher health score first,
+    then fewer risks. Products without a score rank last.
+    """
+    score = health_score if health_score is not None else -1
+    return (-score, risk_count)
+
+class CategoryIndex:
+    """
+    In-memory index of analyzed products keyed by category. Each category
+    keeps a bounded list of its best products ordered by rank_key, updated
+    incrementally as products are analyzed, so alternatives are answered
+    without scanning a catalog. Past `max_products` the least recently
+    indexed product is dropped.
+    """
+    def __init__(self, top_k=20, max_products=100000):
+        self.top_k = top_k
+        self.max_products = max_products
+        # Keep some headroom so a top product being re-ranked does not empty the list
+        self.capacity = top_k * 2
+        self.products = {}    # barcode -> (rank key, summary, categories), in indexing order
+        self.categories = {}  # category -> sorted list of (rank key, barcode)
+        self.lock = threading.Lock()
+
+    def __contains__(self, barcode):
+        return barcode in self.products
+
+    def __len__(self):
+        return len(self.products)
+
+    def add(self, barcode, product, health_score, risks):
+        """
+        Adds or re-ranks a product after analysis.
+        """
+        categories = normalize_categories(product.get("categories"))
+        key = rank_key(health_score, len(risks or []))
+        summary = {
+            "barcode": barcode,
+            "name": product.get("name"),
+            "brand": product.get("brand"),
+            "image_url": product.get("image_url"),
+            "health_score": health_score,
+            "risk_count": len(risks or []),
+        }
+
+        with self.lock:
+            self._remove(barcode)
+            self.products[barcode] = (key, summary, categories)
+            for category in categories:
+                ranked = self.categories.setdefault(category, [])
+                if len(ranked) >= self.capacity and (key, barcode) >= ranked[-1]:
+                    continue
+                bisect.insort(ranked, (key, barcode))
+                if len(ranked) > self.capacity:
+                    ranked.pop()
+            while len(self.products) > self.max_products:
+                self._remove(next(iter(self.products)))
+
+    def remove(self, barcode):
+        with self.lock:
+            self._remove(barcode)
+
+    def _remove(self, barcode):
+        old = self.products.pop(barcode, None)
+        if old is None:
+            return
+        old_key, _, old_categories = old
+        for category in old_categories:
+            ranked = self.categories.get(category)
+            if not ranked:
+                continue
+            i = bisect.bisect_left(ranked, (old_key, barcode))
+            if i < len(ranked) and ranked[i] == (old_key, barcode):
+                del ranked[i]
+            if not ranked:
+                del self.categories[category]
+
+    def alternatives(self, barcode, limit=5):
+        """
+        Returns up to `limit` products that rank strictly better than the
+        given one, searching its most specific category first.
+        Returns None if the product is not indexed.
+        """
+        with self.lock:
+            entry = self.products.get(barcode)
+            if entry is None:
+                return None
+
+            key, _, categories = entry
+            results = []
+            seen = {barcode}
+            # OpenFoodFacts lists categories from general to specific
+            for category in reversed(categories):
+                for other_key, other in self.categories.get(category, ()):
+                    if other_key >= key:
+                        break
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    results.append(dict(self.products[other][1], category=category))
+                    if len(results) >= limit:
+                        return results
+            return results
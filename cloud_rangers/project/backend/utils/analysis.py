@@ -0,0 +1,56 @@
+import hashlib
+import json
+from .data_processor import product_ingredients
+from .risk_engine import check_banned_ingredients, calculate_health_score
+
+# Fields produced by normalize_product_data
+PRODUCT_FIELDS = (
+    "name", "brand", "image_url", "ingredients_text", "ingredients", "additives_tags",
+    "nutriments", "categories", "nova_group", "nutriscore_grade", "source",
+)
+# Fields computed by the analysis pipeline
+ANALYSIS_FIELDS = ("parsed_ingredients", "risks", "health_score")
+# Attached by the API from the local recall index (not computed here)
+RECALL_FIELDS = ("recalls",)
+ALL_FIELDS = PRODUCT_FIELDS + ANALYSIS_FIELDS + RECALL_FIELDS
+
+def parse_fields(fields_param):
+    """
+    Parses a comma-separated `fields=` value into a tuple of field names in
+    canonical order. Returns ALL_FIELDS when the parameter is empty.
+    Raises ValueError on unknown fields.
+    """
+    if not fields_param:
+        return ALL_FIELDS
+
+    requested = {f.strip() for f in fields_param.split(",") if f.strip()}
+    unknown = requested.difference(ALL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(ALL_FIELDS)}")
+    return tuple(f for f in ALL_FIELDS if f in requested)
+
+def product_version(product):
+    """
+    Stable digest of the normalized product data, used to version responses.
+    """
+    canonical = json.dumps(product, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def analyze_product(product, banned_df, fields=ALL_FIELDS):
+    """
+    Builds the response for a normalized product, computing only the
+    analysis parts needed for the selected fields.
+    """
+    response = {f: product.get(f) for f in fields if f in PRODUCT_FIELDS}
+
+    ingredients_list = None
+    if "parsed_ingredients" in fields or "risks" in fields:
+        ingredients_list = product_ingredients(product)
+    if "parsed_ingredients" in fields:
+        response["parsed_ingredients"] = ingredients_list
+    if "risks" in fields:
+        response["risks"] = check_banned_ingredients(ingredients_list, banned_df, product.get("additives_tags"))
+    if "health_score" in fields:
+        response["health_score"] = calculate_health_score(product.get("nutriments", {}))
+
+    return response
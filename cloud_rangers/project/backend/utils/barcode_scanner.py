@@ -1,7 +1,6 @@
-import cv2
-import numpy as np
-from pyzbar.pyzbar import decode
-from PIL import Image
+import logging
+
+logger = logging.getLogger(__name__)
 
 def decode_barcode(image):
     """
@@ -9,6 +8,12 @@ def decode_barcode(image):
     Returns the barcode data as a string, or None if not found.
     """
     try:
+        # Imaging libraries are imported on first decode; they dominate startup time
+        import cv2
+        import numpy as np
+        from pyzbar.pyzbar import decode
+        from PIL import Image
+
         if isinstance(image, Image.Image):
             image = np.array(image.convert('RGB'))
             # Convert RGB to BGR for OpenCV
@@ -34,5 +39,5 @@ def decode_barcode(image):
         return None
 
     except Exception as e:
-        print(f"Error decoding barcode: {e}")
+        logger.warning("Error decoding barcode: %s", e)
         return None
@@ -0,0 +1,48 @@
+import json
+import logging
+from .data_processor import flatten_ingredients
+
+logger = logging.getLogger(__name__)
+
+def iter_catalog(path):
+    """
+    Streams products from a JSONL catalog export, one product per line.
+    Accepts raw OpenFoodFacts product documents (code, product_name, brands, ...)
+    or records already in the lookup_product shape with a "barcode" key.
+    Yields (barcode, raw_data) in the lookup_product shape.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning("Skipping invalid catalog line %d: %s", line_number, e)
+                continue
+
+            # OpenFoodFacts API responses wrap the document in "product"
+            if "product" in record and isinstance(record["product"], dict):
+                record = dict(record["product"], code=record.get("code", record["product"].get("code")))
+
+            barcode = str(record.get("barcode") or record.get("code") or "").strip()
+            if not barcode:
+                continue
+
+            if "product_name" in record or "brands" in record:
+                yield barcode, {
+                    'name': record.get('product_name', 'Unknown Product'),
+                    'brand': record.get('brands', 'Unknown Brand'),
+                    'ingredients_text': record.get('ingredients_text', ''),
+                    'ingredients': flatten_ingredients(record.get('ingredients')),
+                    'additives_tags': record.get('additives_tags', []),
+                    'image_url': record.get('image_url', ''),
+                    'nutriments': record.get('nutriments', {}),
+                    'categories': record.get('categories', ''),
+                    'nova_group': record.get('nova_group', None),
+                    'nutriscore_grade': record.get('nutriscore_grade', None),
+                    'source': 'Catalog'
+                }
+            else:
+                yield barcode, dict(record, source=record.get("source", "Catalog"))
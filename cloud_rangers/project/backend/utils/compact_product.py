@@ -0,0 +1,94 @@
+import math
+import sys
+from array import array
+
+# The only nutrients scoring, profile matching, prompts and the UI read
+NUTRIENT_KEYS = (
+    "energy-kcal_100g", "sugars_100g", "salt_100g", "saturated-fat_100g",
+    "fat_100g", "carbohydrates_100g", "fiber_100g", "proteins_100g",
+)
+_MISSING = float("nan")
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return _MISSING
+    return number if math.isfinite(number) else _MISSING
+
+def intern_strings(values):
+    """
+    Interns a list of short, highly repetitive strings (e.g. parsed
+    ingredient names) and returns them as a tuple.
+    """
+    return tuple(_intern(v) for v in values or ())
+
+class CompactProduct:
+    """
+    Memory-lean form of a normalized product for caching: nutrients live in
+    a fixed float array (NaN = missing) instead of the full upstream dict,
+    and brand/category/source/ingredient/additive strings are interned so
+    repeated values are shared across products. `to_dict` returns the
+    normalize_product_data shape.
+    """
+    __slots__ = (
+        "name", "brand", "image_url", "ingredients_text", "ingredients", "additives_tags",
+        "nutrients", "categories", "nova_group", "nutriscore_grade", "source",
+    )
+
+    def __init__(self, name, brand, image_url, ingredients_text, ingredients, additives_tags,
+                 nutrients, categories, nova_group, nutriscore_grade, source):
+        self.name = name
+        self.brand = brand
+        self.image_url = image_url
+        self.ingredients_text = ingredients_text
+        self.ingredients = ingredients
+        self.additives_tags = additives_tags
+        self.nutrients = nutrients
+        self.categories = categories
+        self.nova_group = nova_group
+        self.nutriscore_grade = nutriscore_grade
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, product):
+        nutriments = product.get("nutriments") or {}
+        categories = (c.strip() for c in product.get("categories") or ())
+        return cls(
+            name=product.get("name"),
+            brand=_intern(product.get("brand")),
+            image_url=product.get("image_url"),
+            ingredients_text=product.get("ingredients_text"),
+            ingredients=intern_strings(product.get("ingredients")),
+            additives_tags=intern_strings(product.get("additives_tags")),
+            nutrients=array("d", (_number(nutriments.get(key)) for key in NUTRIENT_KEYS)),
+            categories=tuple(_intern(c) for c in categories if c),
+            nova_group=product.get("nova_group"),
+            nutriscore_grade=_intern(product.get("nutriscore_grade")),
+            source=_intern(product.get("source")),
+        )
+
+    def nutriments(self):
+        return {
+            key: int(value) if value.is_integer() else value
+            for key, value in zip(NUTRIENT_KEYS, self.nutrients)
+            if not math.isnan(value)
+        }
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "brand": self.brand,
+            "image_url": self.image_url,
+            "ingredients_text": self.ingredients_text,
+            "ingredients": list(self.ingredients),
+            "additives_tags": list(self.additives_tags),
+            "nutriments": self.nutriments(),
+            "categories": list(self.categories),
+            "nova_group": self.nova_group,
+            "nutriscore_grade": self.nutriscore_grade,
+            "source": self.source,
+        }
@@ -5,18 +5,46 @@ def normalize_product_data(api_data):
     if not api_data:
         return None
 
+    categories = api_data.get("categories", "")
+    if isinstance(categories, str):
+        categories = categories.split(',')
+
+    # Structured OpenFoodFacts data; empty when the source only has free text
+    ingredients = [ing.strip().lower() for ing in api_data.get("ingredients") or [] if ing and ing.strip()]
+
     return {
         "name": api_data.get("name", "Unknown Product"),
         "brand": api_data.get("brand", "Unknown Brand"),
         "image_url": api_data.get("image_url", ""),
         "ingredients_text": api_data.get("ingredients_text", ""),
+        "ingredients": ingredients,
+        "additives_tags": list(api_data.get("additives_tags") or []),
         "nutriments": api_data.get("nutriments", {}),
-        "categories": api_data.get("categories", "").split(','),
+        "categories": list(categories),
         "nova_group": api_data.get("nova_group"),
         "nutriscore_grade": api_data.get("nutriscore_grade"),
         "source": api_data.get("source", "Unknown")
     }
 
+def flatten_ingredients(ingredients):
+    """
+    Flattens OpenFoodFacts' nested `ingredients` array into ingredient texts,
+    parents before their sub-ingredients.
+    """
+    texts = []
+    for ingredient in ingredients or []:
+        if ingredient.get("text"):
+            texts.append(ingredient["text"])
+        texts.extend(flatten_ingredients(ingredient.get("ingredients")))
+    return texts
+
+def product_ingredients(product):
+    """
+    The product's ingredient list: the structured list when the source
+    provided one, otherwise parsed from the free text.
+    """
+    return product.get("ingredients") or parse_ingredients(product.get("ingredients_text"))
+
 def parse_ingredients(ingredients_text):
     """
     Parses the ingredients text into a list of individual ingredients.
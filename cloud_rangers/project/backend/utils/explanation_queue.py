@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+from .rate_limit import is_quota_error
+from .quota import INTERACTIVE
+
+class ExplanationQueue:
+    """
+    Queues Gemini explanation requests by priority behind a cap on in-flight
+    calls; the calls themselves wait for the shared Gemini quota (see
+    utils.quota). With batch_size > 1, requests arriving within
+    `batch_window` seconds are explained together in one structured prompt
+    and the result is split back per product.
+    Quota errors are retried with backoff instead of being returned to the
+    user. Model calls are async with a per-call `timeout`, and are cancelled
+    once every caller waiting on them is gone.
+    """
+    def __init__(self, get_handler, max_in_flight=4,
+                 batch_size=1, batch_window=0.05, max_retries=3, backoff=2.0, timeout=None):
+        self.get_handler = get_handler
+        self.timeout = timeout
+        self.counter = itertools.count()
+        self.max_in_flight = max_in_flight
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue = None
+        self.semaphore = None
+        self.dispatcher = None
+        self.tasks = set()
+
+    def _ensure_started(self):
+        # The queue and its dispatcher are bound to the running event loop
+        if self.dispatcher is None or self.dispatcher.done():
+            self.queue = asyncio.PriorityQueue()
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+            self.dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def explain(self, product_name, ingredients, risks, raise_errors=False, priority=INTERACTIVE):
+        """
+        Returns the explanation text for one product once the queue gets to it.
+        Errors are returned as "Error generating explanation: ..." text unless
+        `raise_errors` is set.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((priority, next(self.counter), (product_name, ingredients, risks), future))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if raise_errors:
+                raise
+            return f"Error generating explanation: {str(e)}"
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_size > 1:
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+            # Callers that gave up while queued do not cost quota
+            priority = min(item[0] for item in batch)
+            batch = [(request, future) for _, _, request, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            await self.semaphore.acquire()
+            task = loop.create_task(self._run(batch, priority))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch, priority):
+        call = asyncio.ensure_future(self._call_with_retries([request for request, _ in batch], priority))
+
+        def cancel_if_abandoned(_):
+            if all(future.cancelled() for _, future in batch):
+                call.cancel()
+
+        for _, future in batch:
+            future.add_done_callback(cancel_if_abandoned)
+
+        try:
+            results = await call
+            for (_, future), text in zip(batch, results):
+                if not future.done():
+                    future.set_result(text)
+        except asyncio.CancelledError:
+            # Every caller went away (e.g. clients disconnected); nothing to report
+            pass
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.semaphore.release()
+
+    async def _call_with_retries(self, requests, priority):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._call(requests, priority)
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_retries:
+                    raise
+                # The quota manager already paused Gemini for everyone; back off this batch too
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _call(self, requests, priority):
+        handler = self.get_handler()
+        if handler is None:
+            raise RuntimeError("AI Service Unavailable")
+        if len(requests) == 1:
+            return [await handler.generate_explanation_async(*requests[0], timeout=self.timeout, priority=priority)]
+        try:
+            return await handler.explain_risks_batch_async(requests, timeout=self.timeout, priority=priority)
+        except ValueError:
+            # The model did not return one explanation per product; explain them one by one
+            return list(await asyncio.gather(*[
+                handler.generate_explanation_async(*request, timeout=self.timeout, priority=priority)
+                for request in requests
+            ]))
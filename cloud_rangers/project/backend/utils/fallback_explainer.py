@@ -0,0 +1,58 @@
+from .prompt_builder import dedupe_risks
+
+# Same bands the Streamlit UI colours the health score with
+SCORE_BANDS = (
+    (70, "Good", "Nutritionally this is a reasonable choice."),
+    (40, "Moderate", "Nutritionally this is middling; watch portion sizes."),
+    (0, "Poor", "Nutritionally this scores poorly (high sugar, salt or saturated fat, or little fiber and protein)."),
+)
+
+def score_band(health_score):
+    if health_score is None:
+        return None
+    for threshold, label, summary in SCORE_BANDS:
+        if health_score > threshold or threshold == 0:
+            return label, summary
+
+def recommendation(risks, health_score=None):
+    """
+    Deterministic verdict from the risk engine output and health score.
+    """
+    levels = {str(r.get("risk_level") or "").lower() for r in risks}
+    if "high" in levels or (health_score is not None and health_score <= 40):
+        return "Avoid"
+    if "medium" in levels or (health_score is not None and health_score <= 70):
+        return "Consume in Moderation"
+    return "Safe"
+
+def build_fallback_explanation(product_name, risks, health_score=None):
+    """
+    Template-based Markdown explanation built only from the risk engine
+    output (risk levels, Details, Banned In) and the health score band.
+    Instant and always available, used when the AI explanation is slow or
+    not configured.
+    """
+    risks = dedupe_risks(risks)
+    verdict = recommendation(risks, health_score)
+    lines = [f"**Recommendation: {verdict}**", ""]
+
+    if risks:
+        lines.append(f"**{product_name}** contains {len(risks)} ingredient{'s' if len(risks) != 1 else ''} flagged in our database:")
+        lines.append("")
+        for risk in risks:
+            line = f"- **{risk['ingredient']}** ({risk.get('risk_level') or 'Unknown'} risk)"
+            if risk.get("details"):
+                line += f": {risk['details']}"
+            banned_in = risk.get("banned_in")
+            if banned_in and banned_in != "-":
+                line += f" *Banned or restricted in: {banned_in}.*"
+            lines.append(line)
+    else:
+        lines.append(f"No ingredients in **{product_name}** match our banned or restricted ingredients database.")
+
+    band = score_band(health_score)
+    if band:
+        label, summary = band
+        lines += ["", f"**Health score: {round(health_score)}/100 ({label}).** {summary}"]
+
+    return "\n".join(lines)
@@ -1,58 +1,144 @@
-import google.generativeai as genai
 import os
+import json
+import asyncio
+from .prompt_builder import build_explanation_prompt, build_batch_prompt, build_chat_context, DEFAULT_TOKEN_BUDGET
+from .quota import quota_manager, INTERACTIVE
 try:
-    from ..config import get_api_key
+    from ..config import get_api_key, get_upstream_url
 except ImportError:
     # If running where backend is in sys.path
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from config import get_api_key
+    from config import get_api_key, get_upstream_url
+
+# Default deadline for a single model call, in seconds
+DEFAULT_TIMEOUT = 30
 
 class GeminiHandler:
-    def __init__(self):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, token_budget=DEFAULT_TOKEN_BUDGET):
         api_key = get_api_key("gemini")
             
         if not api_key:
             raise ValueError("Gemini API Key not found in secrets or environment variables.")
-        
-        genai.configure(api_key=api_key)
+
+        # Imported here so processes that never create a handler skip the SDK import
+        import google.generativeai as genai
+        base_url = get_upstream_url("gemini")
+        # The SDK's async client is gRPC only, so REST endpoints run the sync call in a thread
+        self.async_supported = not base_url
+        if base_url:
+            # Custom endpoints (e.g. a local stand-in) are only reachable over REST
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": base_url})
+        else:
+            genai.configure(api_key=api_key)
         # Using gemini-1.5-pro as requested
         self.model = genai.GenerativeModel('gemini-1.5-pro')
         self.chat_session = None
+        self.timeout = timeout
+        # Prompts are compacted and truncated to this many (estimated) tokens
+        self.token_budget = token_budget
+
+    async def _with_deadline(self, awaitable, timeout):
+        """
+        Awaits a model call, cancelling it if it exceeds the deadline.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Gemini call timed out after {timeout}s")
+
+    def _generate(self, prompt, priority=INTERACTIVE, **kwargs):
+        quota_manager.acquire("gemini", priority)
+        with quota_manager.track("gemini"):
+            return self.model.generate_content(prompt, **kwargs)
+
+    async def _generate_async(self, prompt, timeout=None, priority=INTERACTIVE, **kwargs):
+        await quota_manager.acquire_async("gemini", priority)
+        if self.async_supported:
+            call = self.model.generate_content_async(prompt, **kwargs)
+        else:
+            call = asyncio.to_thread(self.model.generate_content, prompt, **kwargs)
+        with quota_manager.track("gemini"):
+            return await self._with_deadline(call, timeout)
+
+    def build_explanation_prompt(self, product_name, ingredients, risks):
+        return build_explanation_prompt(product_name, ingredients, risks, self.token_budget)
+
+    def generate_explanation(self, product_name, ingredients, risks):
+        """
+        Like explain_risks, but raises on API errors (e.g. quota exhausted)
+        so callers can retry or back off.
+        """
+        prompt = self.build_explanation_prompt(product_name, ingredients, risks)
+        response = self._generate(prompt)
+        return response.text
+
+    async def generate_explanation_async(self, product_name, ingredients, risks, timeout=None, priority=INTERACTIVE):
+        """
+        Async generate_explanation with a deadline; cancelling the awaiting
+        task cancels the model call.
+        """
+        prompt = self.build_explanation_prompt(product_name, ingredients, risks)
+        response = await self._generate_async(prompt, timeout, priority)
+        return response.text
 
     def explain_risks(self, product_name, ingredients, risks):
         """
         Generates a user-friendly explanation of identified risks using Gemini.
         """
-        prompt = f"""
-        You are an expert food safety analyst. Analyze the following product for a consumer.
-        
-        Product: {product_name}
-        Ingredients: {', '.join(ingredients)}
-        
-        Identified Potential Risks (from our database):
-        {risks}
-        
-        Task:
-        1. Explain WHY these specific ingredients are flagged.
-        2. Assess the overall healthiness of the product.
-        3. Provide a clear recommendation (e.g., "Avoid", "Consume in Moderation", "Safe").
-        
-        Format the output with Markdown, using bolding and bullet points for readability. Be concise but informative.
-        """
-        
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self.generate_explanation(product_name, ingredients, risks)
         except Exception as e:
             return f"Error generating explanation: {str(e)}"
 
+    async def explain_risks_async(self, product_name, ingredients, risks, timeout=None):
+        """
+        Async explain_risks: does not block the event loop and gives up after `timeout` seconds.
+        """
+        try:
+            return await self.generate_explanation_async(product_name, ingredients, risks, timeout)
+        except Exception as e:
+            return f"Error generating explanation: {str(e)}"
+
+    def explain_risks_batch(self, products):
+        """
+        Explains several products in one request.
+        `products` is a list of (product_name, ingredients, risks) tuples.
+        Returns the explanations in the same order; raises ValueError if the
+        model's answer cannot be split per product.
+        """
+        response = self._generate(
+            self.build_batch_prompt(products),
+            generation_config={"response_mime_type": "application/json"},
+        )
+        return self.split_batch_response(response.text, len(products))
+
+    async def explain_risks_batch_async(self, products, timeout=None, priority=INTERACTIVE):
+        response = await self._generate_async(
+            self.build_batch_prompt(products),
+            timeout,
+            priority,
+            generation_config={"response_mime_type": "application/json"},
+        )
+        return self.split_batch_response(response.text, len(products))
+
+    def build_batch_prompt(self, products):
+        return build_batch_prompt(products, self.token_budget)
+
+    def split_batch_response(self, text, count):
+        try:
+            explanations = json.loads(text)
+            return [str(explanations[str(i)]) for i in range(1, count + 1)]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Could not split batched explanation: {e}")
+
     def start_chat(self, product_context):
         """
         Initializes a chat session with context about the product.
         """
         history = [
-            {"role": "user", "parts": [f"I am looking at a product called {product_context['name']}. Here are the details: {product_context}"]},
+            {"role": "user", "parts": [f"I am looking at a product called {product_context['name']}. Here are the details:\n{build_chat_context(product_context, self.token_budget)}"]},
             {"role": "model", "parts": ["Okay, I understand. I am ready to answer questions about this product."]}
         ]
         self.chat_session = self.model.start_chat(history=history)
@@ -65,7 +151,28 @@ class GeminiHandler:
              return "Chat session not initialized. Please scan a product first."
             
         try:
-            response = self.chat_session.send_message(message)
+            quota_manager.acquire("gemini")
+            with quota_manager.track("gemini"):
+                response = self.chat_session.send_message(message)
+            return response.text
+        except Exception as e:
+            return f"Error sending message: {str(e)}"
+
+    async def send_message_async(self, message, timeout=None):
+        """
+        Async send_message with a deadline.
+        """
+        if not self.chat_session:
+             return "Chat session not initialized. Please scan a product first."
+
+        try:
+            await quota_manager.acquire_async("gemini")
+            if self.async_supported:
+                call = self.chat_session.send_message_async(message)
+            else:
+                call = asyncio.to_thread(self.chat_session.send_message, message)
+            with quota_manager.track("gemini"):
+                response = await self._with_deadline(call, timeout)
             return response.text
         except Exception as e:
             return f"Error sending message: {str(e)}"
@@ -0,0 +1,223 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Column order of the history files
+HISTORY_COLUMNS = (
+    "ts", "barcode", "source", "channel", "health_score", "risk_count",
+    "risk_ingredients", "risk_levels", "rules_version", "cached", "duration_ms",
+)
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("barcode", pa.string()),
+        ("source", pa.string()),
+        ("channel", pa.string()),
+        ("health_score", pa.float64()),
+        ("risk_count", pa.int32()),
+        ("risk_ingredients", pa.list_(pa.string())),
+        ("risk_levels", pa.list_(pa.string())),
+        ("rules_version", pa.string()),
+        ("cached", pa.bool_()),
+        ("duration_ms", pa.float64()),
+    ])
+
+def history_row(barcode, analysis, source=None, channel="http", rules_version=None, cached=False, duration_ms=None):
+    """
+    One history record from an analysis response. Fields the response did
+    not include (sparse `fields=` requests) are left empty.
+    """
+    risks = analysis.get("risks")
+    return {
+        "ts": datetime.now(timezone.utc),
+        "barcode": barcode,
+        "source": source,
+        "channel": channel,
+        "health_score": analysis.get("health_score"),
+        "risk_count": len(risks) if risks is not None else None,
+        "risk_ingredients": [str(r.get("ingredient")) for r in risks] if risks is not None else None,
+        "risk_levels": [str(r.get("risk_level")) for r in risks] if risks is not None else None,
+        "rules_version": rules_version,
+        "cached": cached,
+        "duration_ms": duration_ms,
+    }
+
+class HistorySink:
+    """
+    Append-only analysis history. `record` only appends to an in-memory
+    buffer; a background thread flushes it every `flush_interval` seconds
+    (or once `flush_rows` are waiting) to Parquet files partitioned by UTC
+    day: <directory>/day=YYYY-MM-DD/part-*.parquet. Disabled (records are
+    dropped) if pyarrow is not installed.
+    """
+    def __init__(self, directory, flush_rows=10000, flush_interval=60, max_buffered=200000):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.buffer = []
+        self.dropped = 0
+        self.enabled = True
+        self.lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, row):
+        if not self.enabled:
+            return
+        with self.lock:
+            if len(self.buffer) >= self.max_buffered:
+                # The writer is falling behind (e.g. disk errors); never grow without bound
+                self.dropped += 1
+                return
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Writes the buffered rows, one file per day. Returns the row count.
+        """
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        if not rows:
+            return 0
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row["ts"].strftime("%Y-%m-%d"), []).append(row)
+        schema = _schema()
+        for day, day_rows in by_day.items():
+            table = pa.Table.from_pylist(day_rows, schema=schema)
+            partition = os.path.join(self.directory, f"day={day}")
+            os.makedirs(partition, exist_ok=True)
+            name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp_path = os.path.join(partition, f".{name}.tmp")
+            pq.write_table(table, tmp_path, compression="zstd")
+            # Readers only ever see complete files
+            os.replace(tmp_path, os.path.join(partition, name))
+        return len(rows)
+
+    def start(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("pyarrow is not installed; analysis history is disabled")
+            self.enabled = False
+            return
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self.enabled:
+            self._safe_flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._safe_flush()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Error writing analysis history to %s", self.directory)
+
+def _day_filter(start, end):
+    import pyarrow.dataset as ds
+    condition = None
+    if start is not None:
+        condition = ds.field("day") >= start.strftime("%Y-%m-%d")
+    if end is not None:
+        upper = ds.field("day") <= end.strftime("%Y-%m-%d")
+        condition = upper if condition is None else condition & upper
+    return condition
+
+def load_history(directory, start=None, end=None, columns=None):
+    """
+    Reads the history between two dates (inclusive, either may be None) as
+    a pyarrow Table. Only the matching day partitions and the requested
+    columns are read.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    if not os.path.isdir(directory):
+        return _schema().empty_table().select(list(columns or HISTORY_COLUMNS))
+    dataset = ds.dataset(
+        directory, format="parquet", schema=_schema().append(pa.field("day", pa.string())),
+        partitioning="hive",
+    )
+    return dataset.to_table(columns=list(columns or HISTORY_COLUMNS), filter=_day_filter(start, end))
+
+def last_days(days, now=None):
+    """
+    (start, end) dates covering the last `days` days, today included.
+    """
+    today = (now or datetime.now(timezone.utc)).date()
+    return today - timedelta(days=days - 1), today
+
+def top_risks(directory, start=None, end=None, limit=20):
+    """
+    Most scanned risky ingredients: [{"ingredient", "risk_level", "scans",
+    "products"}], by number of scans.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    table = load_history(directory, start, end, ["barcode", "risk_ingredients", "risk_levels"])
+    # One row per (scan, risk)
+    parent = pc.list_parent_indices(table["risk_ingredients"])
+    flat = pa.table({
+        "ingredient": pc.list_flatten(table["risk_ingredients"]),
+        "risk_level": pc.list_flatten(table["risk_levels"]),
+        "barcode": pc.take(table["barcode"], parent),
+    })
+    grouped = flat.group_by(["ingredient", "risk_level"]).aggregate([
+        ("barcode", "count"), ("barcode", "count_distinct"),
+    ])
+    grouped = grouped.sort_by([("barcode_count", "descending")]).slice(0, limit)
+    return [
+        {"ingredient": r["ingredient"], "risk_level": r["risk_level"],
+         "scans": r["barcode_count"], "products": r["barcode_count_distinct"]}
+        for r in grouped.to_pylist()
+    ]
+
+def daily_summary(directory, start=None, end=None):
+    """
+    Per-day totals: scans, distinct products, scans with at least one risk,
+    mean health score and p50/p95 handler time.
+    """
+    import pyarrow.compute as pc
+    table = load_history(directory, start, end, ["ts", "barcode", "risk_count", "health_score", "duration_ms"])
+    table = table.append_column("date", pc.strftime(table["ts"], format="%Y-%m-%d"))
+    table = table.append_column("risky", pc.greater(pc.fill_null(table["risk_count"], 0), 0))
+    grouped = table.group_by("date").aggregate([
+        ("barcode", "count"), ("barcode", "count_distinct"), ("risky", "sum"),
+        ("health_score", "mean"), ("duration_ms", "tdigest", pc.TDigestOptions(q=[0.5, 0.95])),
+    ]).sort_by("date")
+    return [
+        {"date": r["date"], "scans": r["barcode_count"], "products": r["barcode_count_distinct"],
+         "risky_scans": r["risky_sum"], "mean_health_score": r["health_score_mean"],
+         "p50_ms": (r["duration_ms_tdigest"] or [None, None])[0],
+         "p95_ms": (r["duration_ms_tdigest"] or [None, None])[1]}
+        for r in grouped.to_pylist()
+    ]
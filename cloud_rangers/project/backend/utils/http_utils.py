@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_json(obj):
+    """
+    Serializes a response payload to compact JSON bytes.
+    Uses orjson when installed, falling back to the standard library.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+def loads_json(data):
+    """
+    Parses JSON bytes or text, with orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class ClientDisconnected(Exception):
+    pass
+
+async def run_until_disconnected(is_disconnected, awaitable, poll_interval=0.25):
+    """
+    Awaits `awaitable` while polling `is_disconnected` (e.g. Starlette's
+    request.is_disconnected). If the client goes away first, the work is
+    cancelled and ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+def strong_etag(data, suffix=""):
+    """
+    Builds a strong ETag from the content bytes.
+    `suffix` distinguishes representations of the same content (e.g. "gz").
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return f'"{digest}-{suffix}"' if suffix else f'"{digest}"'
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag.
+    Uses weak comparison as required for If-None-Match, and treats encoded
+    representations of the same content (e.g. "abc-gz" and "abc") as equal.
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    base = _etag_base(etag)
+    for candidate in if_none_match.split(","):
+        if _etag_base(candidate) == base:
+            return True
+    return False
+
+def _etag_base(tag):
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ("-gz", "-br"):
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+def accepted_encodings(accept_encoding):
+    """
+    Parses an Accept-Encoding header into the set of codings with a non-zero q-value.
+    """
+    accepted = set()
+    if not accept_encoding:
+        return accepted
+
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
@@ -0,0 +1,242 @@
+import hashlib
+import ipaddress
+import os
+import socket
+import threading
+from io import BytesIO
+from urllib.parse import urljoin, urlparse
+
+import requests
+import urllib3
+
+# Thumbnails are only rendered at these widths so the cache stays bounded
+THUMBNAIL_WIDTHS = (100, 200, 400, 800)
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# A small compressed file can still decode to gigabytes; checked before decoding
+MAX_SOURCE_PIXELS = 40_000_000
+MAX_REDIRECTS = 3
+# Open Food Facts serves product images from subdomains of this host
+DEFAULT_ALLOWED_HOSTS = ("openfoodfacts.org",)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+class ImageFetchError(Exception):
+    """
+    The remote image could not be fetched or decoded.
+    """
+
+def snap_width(width):
+    """
+    Rounds a requested width up to the nearest supported thumbnail width.
+    """
+    for allowed in THUMBNAIL_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+def preferred_format(accept_header):
+    return "webp" if "image/webp" in (accept_header or "") else "jpeg"
+
+def host_allowed(host, allowed_hosts):
+    """
+    True if `host` is one of `allowed_hosts` or a subdomain of one. None
+    allows every host.
+    """
+    if allowed_hosts is None:
+        return True
+    host = host.lower().rstrip(".")
+    return any(host == allowed or host.endswith(f".{allowed}") for allowed in allowed_hosts)
+
+def checked_address(url, allow_private=False, allowed_hosts=None):
+    """
+    Resolves the host of an http(s) URL and returns one of its addresses to
+    connect to. Raises ValueError if the host is not in `allowed_hosts` or,
+    unless `allow_private`, if any address is not public, so the proxy
+    cannot be pointed at arbitrary sites or internal services.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("URL is not allowed")
+    if not host_allowed(parsed.hostname, allowed_hosts):
+        raise ValueError("Host is not allowed")
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, parsed.port, proto=socket.IPPROTO_TCP)]
+    except socket.gaierror:
+        raise ValueError("URL is not allowed")
+    if not addresses:
+        raise ValueError("URL is not allowed")
+    if not allow_private and not all(ipaddress.ip_address(a.split("%")[0]).is_global for a in addresses):
+        raise ValueError("URL is not allowed")
+    return addresses[0]
+
+class ImageCache:
+    """
+    Disk cache of resized thumbnails for remote images. Each (url, width,
+    format) is fetched and rendered once; files are evicted least recently
+    used first (by mtime, refreshed on every hit) once the directory grows
+    past `max_bytes`. Only images on `allowed_hosts` (and their
+    subdomains) are proxied; None allows any public host.
+    """
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, allow_private=False, timeout=10,
+                 allowed_hosts=DEFAULT_ALLOWED_HOSTS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allow_private = allow_private
+        self.allowed_hosts = tuple(h.lower().strip(".") for h in allowed_hosts) if allowed_hosts is not None else None
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.key_locks = {}  # path -> [render lock, requests holding or waiting for it]
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._files())
+
+    def _files(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def path_for(self, url, width, fmt):
+        key = hashlib.sha256(f"{url}|{width}|{fmt}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.{'webp' if fmt == 'webp' else 'jpg'}")
+
+    def get(self, url, width, fmt):
+        """
+        Returns the path of the thumbnail, rendering it on first use.
+        Raises ValueError for URLs that may not be proxied and
+        ImageFetchError if the image cannot be fetched or decoded.
+        """
+        path = self.path_for(url, width, fmt)
+        if self._touch(path):
+            return path
+
+        # Fail fast before taking the render lock; _fetch checks every hop again
+        checked_address(url, self.allow_private, self.allowed_hosts)
+
+        # Concurrent requests for the same thumbnail wait for one render. The
+        # lock is only dropped once nobody holds or waits for it, so a late
+        # request cannot start a second render alongside a waiting one.
+        with self.lock:
+            key_lock = self.key_locks.setdefault(path, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                if self._touch(path):
+                    return path
+                data = self._render(self._fetch(url), width, fmt)
+                self._store(path, data)
+                return path
+        finally:
+            with self.lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self.key_locks[path]
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _fetch(self, url):
+        """
+        Downloads the image. Redirects are followed by hand, and every hop
+        connects to the address that was just checked, so neither a
+        redirect nor a second DNS answer can reach an internal host.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            address = checked_address(url, self.allow_private, self.allowed_hosts)
+            try:
+                pool, response = self._open(url, address)
+            except urllib3.exceptions.HTTPError as e:
+                raise ImageFetchError(f"Could not fetch image: {e}")
+            try:
+                if response.status in REDIRECT_STATUSES:
+                    location = response.headers.get("Location")
+                    if not location:
+                        raise ImageFetchError("Redirect without a Location")
+                    url = urljoin(url, location)
+                    continue
+                if response.status >= 400:
+                    raise ImageFetchError(f"Could not fetch image: HTTP {response.status}")
+                chunks, size = [], 0
+                for chunk in response.stream(64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_SOURCE_BYTES:
+                        raise ImageFetchError("Image too large")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+            except urllib3.exceptions.HTTPError as e:
+                raise ImageFetchError(f"Could not fetch image: {e}")
+            finally:
+                response.release_conn()
+                pool.close()
+        raise ImageFetchError("Too many redirects")
+
+    def _open(self, url, address):
+        # Connect to the checked address; TLS still verifies the URL's hostname
+        parsed = urlparse(url)
+        host = parsed.hostname
+        if parsed.scheme == "https":
+            pool = urllib3.HTTPSConnectionPool(
+                address, parsed.port or 443, server_hostname=host, assert_hostname=host,
+                cert_reqs="CERT_REQUIRED", ca_certs=requests.certs.where(),
+            )
+        else:
+            pool = urllib3.HTTPConnectionPool(address, parsed.port or 80)
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        return pool, pool.urlopen(
+            "GET", path,
+            headers={"Host": f"{host}:{parsed.port}" if parsed.port else host, "User-Agent": "FoodAnalysisApp/1.0"},
+            redirect=False, retries=False, preload_content=False, timeout=urllib3.Timeout(self.timeout),
+        )
+
+    def _render(self, data, width, fmt):
+        # Imported here so the API starts without Pillow until an image is requested
+        from PIL import Image
+        try:
+            # Only reads the header; pixels are decoded by thumbnail()
+            image = Image.open(BytesIO(data))
+            if image.width * image.height > MAX_SOURCE_PIXELS:
+                raise ImageFetchError("Image too large")
+            image.draft("RGB", (width, width))
+            image.thumbnail((width, width * 4))
+        except ImageFetchError:
+            raise
+        except Exception as e:
+            raise ImageFetchError(f"Could not decode image: {e}")
+
+        output = BytesIO()
+        if fmt == "webp":
+            image.save(output, "WEBP", quality=80, method=4)
+        else:
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(output, "JPEG", quality=82, optimize=True, progressive=True)
+        return output.getvalue()
+
+    def _store(self, path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict(keep=path)
+
+    def _evict(self, keep):
+        # Oldest first until we are 10% under the cap
+        target = self.max_bytes * 0.9
+        files = sorted(self._files(), key=lambda f: f[1])
+        self.total_bytes = sum(size for _, _, size in files)
+        for path, _, size in files:
+            if self.total_bytes <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self.total_bytes -= size
+            except FileNotFoundError:
+                pass
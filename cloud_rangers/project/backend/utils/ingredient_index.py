@@ -0,0 +1,72 @@
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def ingredient_tokens(text):
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+class IngredientIndex:
+    """
+    Inverted index from ingredient tokens and additive tags to the barcodes
+    whose cached analyses contain them, so a rules change only re-evaluates
+    the products a changed rule could match.
+    """
+    def __init__(self):
+        self.by_token = {}  # token -> set of barcodes
+        self.by_tag = {}    # additive tag -> set of barcodes
+        self.products = {}  # barcode -> (tokens, tags)
+        self.lock = threading.Lock()
+
+    def __contains__(self, barcode):
+        return barcode in self.products
+
+    def __len__(self):
+        return len(self.products)
+
+    def add(self, barcode, ingredients, additives_tags=()):
+        tokens = frozenset(t for ingredient in ingredients or () for t in ingredient_tokens(ingredient))
+        tags = frozenset(additives_tags or ())
+        with self.lock:
+            if self.products.get(barcode) == (tokens, tags):
+                return
+            self._remove(barcode)
+            self.products[barcode] = (tokens, tags)
+            for token in tokens:
+                self.by_token.setdefault(token, set()).add(barcode)
+            for tag in tags:
+                self.by_tag.setdefault(tag, set()).add(barcode)
+
+    def remove(self, barcode):
+        with self.lock:
+            self._remove(barcode)
+
+    def _remove(self, barcode):
+        tokens, tags = self.products.pop(barcode, ((), ()))
+        for key, table in [(t, self.by_token) for t in tokens] + [(t, self.by_tag) for t in tags]:
+            barcodes = table.get(key)
+            if barcodes is not None:
+                barcodes.discard(barcode)
+                if not barcodes:
+                    del table[key]
+
+    def candidates(self, names, tags=()):
+        """
+        Barcodes whose ingredients could match any of the rule `names`, or
+        that carry any of the additive `tags`. Rules match by substring, so
+        a name matches every indexed token containing its longest token; the
+        result is a superset that check_banned_ingredients narrows down.
+        """
+        with self.lock:
+            found = set()
+            for tag in tags:
+                found.update(self.by_tag.get(tag, ()))
+            for name in names:
+                tokens = ingredient_tokens(name)
+                if not tokens:
+                    return set(self.products)
+                longest = max(tokens, key=len)
+                for token, barcodes in self.by_token.items():
+                    if longest in token:
+                        found.update(barcodes)
+            return found
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (type, status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status);
+"""
+
+# Added after the first release; older databases get them on open
+LEASE_COLUMNS = {"owner": "TEXT", "lease_expires": "REAL"}
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+class JobStore:
+    """
+    Persistent job table in SQLite, shared by every worker process. Each
+    thread gets its own connection (opened on first use); close() closes
+    them all. RUNNING jobs carry an owner and a lease expiry, so a job is
+    only handed to another worker once its owner stopped renewing it.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, column_type in LEASE_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only ever used by this thread; close() may run on another one
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    def find_reusable(self, dedupe_key, result_ttl):
+        """
+        Returns a queued/running job with this key, or a succeeded one newer than result_ttl.
+        """
+        with self._connect() as conn:
+            return self._find_reusable(conn, dedupe_key, result_ttl)
+
+    def _find_reusable(self, conn, dedupe_key, result_ttl):
+        return conn.execute(
+            "SELECT * FROM jobs WHERE dedupe_key = ? AND (status IN (?, ?) OR (status = ? AND updated_at > ?)) "
+            "ORDER BY created_at DESC LIMIT 1",
+            (dedupe_key, QUEUED, RUNNING, SUCCEEDED, time.time() - result_ttl),
+        ).fetchone()
+
+    def insert(self, job_type, payload, dedupe_key, max_attempts, result_ttl):
+        """
+        Queues a job unless find_reusable finds one for `dedupe_key`; the
+        lookup and the insert share one transaction, so concurrent identical
+        submissions (from any process) create a single job. Returns
+        (job_id, created).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = self._find_reusable(conn, dedupe_key, result_ttl)
+            if existing is not None:
+                return existing["id"], False
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, type, payload, dedupe_key, status, max_attempts, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job_type, json.dumps(payload), dedupe_key, QUEUED, max_attempts, now, now, now),
+            )
+        return job_id, True
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def claim(self, job_type, owner, lease):
+        """
+        Atomically moves the oldest runnable job of a type to RUNNING under
+        `owner`, leased for `lease` seconds, and returns it.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE type = ? AND status = ? AND run_after <= ? ORDER BY run_after LIMIT 1",
+                (job_type, QUEUED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_expires = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, owner, now + lease, now, row["id"]),
+            )
+            return row
+
+    def complete(self, job_id, owner, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ? AND owner = ?",
+                (SUCCEEDED, json.dumps(result, default=str), time.time(), job_id, owner),
+            )
+
+    def fail(self, job_id, owner, error, retry_at=None):
+        """
+        Records a failed attempt; requeues the job if retry_at is given.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = COALESCE(?, run_after), owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+                (QUEUED if retry_at is not None else FAILED, error, retry_at, time.time(), job_id, owner),
+            )
+
+    def renew(self, owner, lease):
+        """
+        Extends the lease of every job `owner` is running.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = ? AND owner = ?",
+                (time.time() + lease, RUNNING, owner),
+            )
+
+    def requeue_expired(self):
+        """
+        Puts RUNNING jobs whose lease ran out (their worker died or hung)
+        back in the queue, or fails them once they used up their attempts.
+        Jobs from before leases existed have none. Returns (requeued, failed).
+        """
+        now = time.time()
+        expired = "status = ? AND (lease_expires IS NULL OR lease_expires < ?)"
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, owner = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE {expired} AND attempts >= max_attempts",
+                (FAILED, "Lease expired", now, RUNNING, now),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE {expired}",
+                (QUEUED, now, RUNNING, now),
+            ).rowcount
+        return requeued, failed
+
+    def purge(self, older_than):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, time.time() - older_than),
+            )
+
+def job_to_dict(row):
+    if row is None:
+        return None
+    return {
+        "job_id": row["id"],
+        "type": row["type"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+class JobType:
+    def __init__(self, name, handler, concurrency, max_attempts, backoff, required):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.required = tuple(required)
+
+class JobManager:
+    """
+    Local worker pool over a JobStore. Each registered job type gets its own
+    worker threads (its concurrency limit); failed attempts are retried with
+    exponential backoff; identical submissions are deduplicated. Claimed
+    jobs are leased for `lease` seconds and renewed while this process is
+    alive; jobs whose worker died are requeued once their lease expires.
+    """
+    def __init__(self, store, result_ttl=3600, poll_interval=1.0, lease=60):
+        self.store = store
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self.types = {}
+        self.wakeup = threading.Condition()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def register(self, name, handler, concurrency=2, max_attempts=3, backoff=2.0, required=()):
+        """
+        Registers `handler(payload) -> result` for a job type. `required`
+        lists payload keys checked at submission.
+        """
+        self.types[name] = JobType(name, handler, concurrency, max_attempts, backoff, required)
+
+    def start(self):
+        if self.threads:
+            return
+        self.stopping.clear()
+        self._requeue_expired()
+        self.store.purge(older_than=max(self.result_ttl, 86400))
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self.threads.append(heartbeat)
+        for job_type in self.types.values():
+            for i in range(job_type.concurrency):
+                thread = threading.Thread(target=self._work, args=(job_type,), name=f"job-{job_type.name}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        # Jobs still running after the timeout keep their lease until it expires
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self.threads = []
+        self.store.close()
+
+    def submit(self, name, payload):
+        """
+        Queues a job, or returns the id of an identical queued, running or
+        recently succeeded one. Raises ValueError for unknown types or missing fields.
+        """
+        job_type = self.types.get(name)
+        if job_type is None:
+            raise ValueError(f"Unknown job type '{name}'. Available: {', '.join(sorted(self.types))}")
+        missing = [key for key in job_type.required if key not in payload]
+        if missing:
+            raise ValueError(f"Missing payload fields for '{name}': {', '.join(missing)}")
+
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        dedupe_key = hashlib.sha256(f"{name}:{canonical}".encode("utf-8")).hexdigest()
+        job_id, created = self.store.insert(name, payload, dedupe_key, job_type.max_attempts, self.result_ttl)
+        if created:
+            with self.wakeup:
+                self.wakeup.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        return job_to_dict(self.store.get(job_id))
+
+    def _heartbeat(self):
+        while not self.stopping.wait(self.lease / 3):
+            try:
+                self.store.renew(self.owner, self.lease)
+                self._requeue_expired()
+            except sqlite3.Error:
+                logger.exception("Job store error while renewing leases")
+
+    def _requeue_expired(self):
+        requeued, failed = self.store.requeue_expired()
+        if requeued:
+            logger.info("Requeued %d jobs whose worker stopped renewing them", requeued)
+        if failed:
+            logger.error("Failed %d jobs whose lease expired on their last attempt", failed)
+
+    def _work(self, job_type):
+        while not self.stopping.is_set():
+            try:
+                row = self.store.claim(job_type.name, self.owner, self.lease)
+            except sqlite3.Error:
+                logger.exception("Job store error while claiming %s", job_type.name)
+                row = None
+            if row is None:
+                with self.wakeup:
+                    self.wakeup.wait(self.poll_interval)
+                continue
+            self._run(job_type, row)
+
+    def _run(self, job_type, row):
+        attempts = row["attempts"] + 1
+        try:
+            result = job_type.handler(json.loads(row["payload"]))
+            self.store.complete(row["id"], self.owner, result)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts < job_type.max_attempts:
+                retry_at = time.time() + job_type.backoff * (2 ** (attempts - 1))
+                logger.warning("Job %s (%s) attempt %d failed, retrying: %s", row["id"], job_type.name, attempts, error)
+                self.store.fail(row["id"], self.owner, error, retry_at)
+            else:
+                logger.error("Job %s (%s) failed after %d attempts: %s", row["id"], job_type.name, attempts, error)
+                self.store.fail(row["id"], self.owner, error)
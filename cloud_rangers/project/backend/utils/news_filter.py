@@ -0,0 +1,72 @@
+import re
+from functools import lru_cache
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Words too common to identify a product on their own
+PRODUCT_STOPWORDS = frozenset({"the", "and", "of", "with", "in", "for", "a", "an", "by", "&"})
+
+def compile_keywords(keywords):
+    """
+    Compiles keywords (single words or phrases) into one case-insensitive
+    regex with word boundaries. Longer keywords come first so "recalled"
+    wins over "recall".
+    """
+    alternatives = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+    body = "|".join(re.escape(k).replace(r"\ ", r"\s+") for k in alternatives)
+    return re.compile(rf"\b(?:{body})\b", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def product_pattern(product_name):
+    """
+    Regex matching any distinctive word of the product name as a whole word,
+    so "tea" matches "green tea" but not "steam". None if nothing is left.
+    """
+    words = [w for w in WORD_PATTERN.findall(product_name.lower()) if len(w) > 1 and w not in PRODUCT_STOPWORDS]
+    if not words:
+        return None
+    return compile_keywords(words)
+
+def keyword_score(text, pattern, weights, default_weight=1.0):
+    """
+    Sums the weights of the distinct keywords found in `text`.
+    """
+    found = {m.group(0).lower() for m in pattern.finditer(text)}
+    found = {re.sub(r"\s+", " ", k) for k in found}
+    return sum(weights.get(k, default_weight) for k in found)
+
+def recency_weight(age_days, half_life_days=14.0):
+    """
+    1.0 for today's news, halving every `half_life_days`.
+    """
+    return 0.5 ** (max(age_days, 0) / half_life_days)
+
+def title_shingles(title, size=3):
+    """
+    Word shingles of a headline (character shingles for very short ones),
+    used to spot the same story syndicated under slightly different titles.
+    """
+    words = WORD_PATTERN.findall(title.lower())
+    if len(words) < size + 1:
+        text = " ".join(words)
+        return {text[i:i + 4] for i in range(max(1, len(text) - 3))}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def collapse_near_duplicates(items, get_title, threshold=0.5):
+    """
+    Keeps the first item of every group of near-duplicate titles, preserving
+    order (so rank items best-first before collapsing).
+    """
+    kept, kept_shingles = [], []
+    for item in items:
+        shingles = title_shingles(get_title(item))
+        if any(jaccard(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(item)
+        kept_shingles.append(shingles)
+    return kept
@@ -0,0 +1,53 @@
+import secrets
+import time
+
+class PendingResults:
+    """
+    Keeps background tasks (e.g. AI explanations that missed their latency
+    budget) addressable by an opaque token so clients can fetch the result
+    later. Entries expire after `ttl` seconds; expired unfinished tasks are
+    cancelled.
+    """
+    def __init__(self, ttl=600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # token -> (task, created, context)
+
+    def add(self, task, context=None):
+        self.purge()
+        token = secrets.token_urlsafe(16)
+        # Mark failures as retrieved so unclaimed tokens do not log "exception was never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.entries[token] = (task, time.monotonic(), context)
+        return token
+
+    def get(self, token):
+        """
+        Returns (task, context), or None for unknown or expired tokens.
+        """
+        entry = self.entries.get(token)
+        if entry is None:
+            return None
+        task, created, context = entry
+        if time.monotonic() - created > self.ttl:
+            self._drop(token)
+            return None
+        return task, context
+
+    def pop(self, token):
+        entry = self.entries.pop(token, None)
+        return (entry[0], entry[2]) if entry else None
+
+    def purge(self):
+        now = time.monotonic()
+        expired = [t for t, (_, created, _) in self.entries.items() if now - created > self.ttl]
+        for token in expired:
+            self._drop(token)
+        # Oldest first, if still over capacity
+        while len(self.entries) >= self.max_entries:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, token):
+        task, _, _ = self.entries.pop(token)
+        if not task.done():
+            task.cancel()
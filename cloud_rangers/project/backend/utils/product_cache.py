@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ProductCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL, used for normalized products
+    and their analysis results. `on_evict(key)` is called (outside the lock)
+    for entries dropped because they expired or fell off the LRU end.
+    """
+    def __init__(self, max_entries=5000, ttl=3600, on_evict=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.entries = OrderedDict()  # key -> (value, expires)
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            expired = time.monotonic() >= expires
+            if expired:
+                del self.entries[key]
+            else:
+                self.entries.move_to_end(key)
+        if expired:
+            self._evicted([key])
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = []
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False)[0])
+        self._evicted(evicted)
+
+    def _evicted(self, keys):
+        if self.on_evict is not None:
+            for key in keys:
+                self.on_evict(key)
+
+    def replace(self, key, value):
+        """
+        Swaps the value of a live entry, keeping its expiry and LRU
+        position. Returns False if the key is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                return False
+            self.entries[key] = (value, entry[1])
+            return True
+
+    def pop(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def keys(self):
+        with self.lock:
+            return list(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.entries)
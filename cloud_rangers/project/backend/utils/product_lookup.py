@@ -1,46 +1,98 @@
-import openfoodfacts
+import logging
 import requests
 from .usda_client import USDAClient, normalize_usda_data
+from .data_processor import flatten_ingredients
+from .quota import quota_manager, QuotaExceeded, INTERACTIVE
+from .http_utils import loads_json
+try:
+    from ..config import get_upstream_url
+except ImportError:
+    from config import get_upstream_url
 
-def lookup_product(barcode):
+logger = logging.getLogger(__name__)
+
+OPENFOODFACTS_URL = get_upstream_url("openfoodfacts", "https://world.openfoodfacts.org")
+
+# The only fields normalization and the risk pipeline read. Projecting the
+# request to them skips images, language variants and the rest of the
+# (often several hundred KB) product document.
+OPENFOODFACTS_FIELDS = (
+    "product_name", "brands", "ingredients_text", "ingredients", "additives_tags",
+    "image_url", "nutriments", "categories", "nova_group", "nutriscore_grade",
+)
+
+# One pooled, keep-alive session for all OpenFoodFacts requests
+_session = requests.Session()
+_session.headers.update({"User-Agent": "FoodAnalysisApp/1.0", "Accept-Encoding": "gzip"})
+
+def fetch_openfoodfacts(barcode, priority=INTERACTIVE):
     """
-    Fetches product data from OpenFoodFacts.
+    Fetches the projected product document from OpenFoodFacts (gzip
+    compressed on the wire). Returns the "product" object, or None if
+    OpenFoodFacts does not know the barcode.
+    """
+    quota_manager.acquire("openfoodfacts", priority)
+    with quota_manager.track("openfoodfacts"):
+        response = _session.get(
+            f"{OPENFOODFACTS_URL}/api/v2/product/{barcode}.json",
+            params={"fields": ",".join(OPENFOODFACTS_FIELDS)},
+            timeout=10,
+        )
+        # v2 answers unknown barcodes with 404 and status 0
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+    result = loads_json(response.content)
+    if result.get("status") != 1:
+        return None
+    return result.get("product") or None
+
+def parse_openfoodfacts(product):
+    """
+    Maps a projected OpenFoodFacts product onto the lookup_product shape.
+    """
+    return {
+        'name': product.get('product_name', 'Unknown Product'),
+        'brand': product.get('brands', 'Unknown Brand'),
+        'ingredients_text': product.get('ingredients_text', ''),
+        'ingredients': flatten_ingredients(product.get('ingredients')),
+        'additives_tags': product.get('additives_tags', []),
+        'image_url': product.get('image_url', ''),
+        'nutriments': product.get('nutriments', {}),
+        'categories': product.get('categories', ''),
+        'nova_group': product.get('nova_group', None),
+        'nutriscore_grade': product.get('nutriscore_grade', None),
+        'source': 'OpenFoodFacts'
+    }
+
+def lookup_product(barcode, priority=INTERACTIVE):
+    """
+    Fetches product data from OpenFoodFacts, falling back to USDA.
     Returns a dictionary of product data or None if not found.
+    Raises QuotaExceeded if no source found it and a quota got in the way.
     """
+    quota_error = None
     try:
-        api = openfoodfacts.API(user_agent="FoodAnalysisApp/1.0")
-        code, result = api.product.get(barcode)
-
-        if result['status'] == 1:
-            product = result['product']
-            return {
-                'name': product.get('product_name', 'Unknown Product'),
-                'brand': product.get('brands', 'Unknown Brand'),
-                'ingredients_text': product.get('ingredients_text', ''),
-                'image_url': product.get('image_url', ''),
-                'nutriments': product.get('nutriments', {}),
-                'categories': product.get('categories', ''),
-                'nova_group': product.get('nova_group', None),
-                'nutriscore_grade': product.get('nutriscore_grade', None),
-                'source': 'OpenFoodFacts'
-            }
-        else:
-            # Fallback to USDA or other APIs could go here
-            # For now, return None to indicate failure
-            print(f"Product not found in OpenFoodFacts: {barcode}. Result: {result}")
-            return None
+        product = fetch_openfoodfacts(barcode, priority)
+        if product is not None:
+            return parse_openfoodfacts(product)
+        logger.debug("Product not found in OpenFoodFacts", extra={"barcode": barcode})
 
+    except QuotaExceeded as e:
+        logger.warning("OpenFoodFacts quota exceeded: %s", e, extra={"barcode": barcode})
+        quota_error = e
     except Exception as e:
-        print(f"Error looking up product in OpenFoodFacts: {e}")
+        logger.warning("Error looking up product in OpenFoodFacts: %s", e, extra={"barcode": barcode})
         # Proceed to fallback even if exception
 
     # Fallback to USDA
     try:
-        usda = USDAClient()
+        usda = USDAClient(priority)
         # If barcode is numeric, we can try searching it as a GTPIN or similar in USDA
         # But USDA search is text based usually. Detailed lookup requires FDC ID.
         # "search" endpoint accepts "query". We can pass the barcode.
-        print(f"Searching USDA for barcode: {barcode}")
+        logger.debug("Searching USDA", extra={"barcode": barcode})
         results = usda.search_foods(barcode)
         
         if results:
@@ -52,7 +104,12 @@ def lookup_product(barcode):
                 details = usda.get_food_details(fdc_id)
                 return normalize_usda_data(details)
                 
+    except QuotaExceeded as e:
+        logger.warning("USDA quota exceeded: %s", e, extra={"barcode": barcode})
+        quota_error = quota_error or e
     except Exception as e:
-        print(f"Error looking up product in USDA: {e}")
+        logger.warning("Error looking up product in USDA: %s", e, extra={"barcode": barcode})
 
+    if quota_error:
+        raise quota_error
     return None
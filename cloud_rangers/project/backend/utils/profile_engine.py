@@ -0,0 +1,166 @@
+import re
+from functools import lru_cache
+
+# ---------------------------
+# Product conditions
+# ---------------------------
+# Each condition is detected once per product, either from the parsed
+# ingredients (word-boundary patterns, so "tea" does not match "steam")
+# or from nutriment thresholds per 100g (UK FSA "high" levels).
+INGREDIENT_CONDITIONS = {
+    "contains_nuts": r"peanuts?|almonds?|hazelnuts?|cashews?|walnuts?|pistachios?|pecans?|macadamias?|brazil nuts?|(?<!coco)nuts?|praline|marzipan",
+    "contains_dairy": r"(?<!coconut )milk|(?<!peanut )(?<!cocoa )(?<!shea )butter|cream|cheese|whey|casein(?:ate)?|lactose|yog(?:h)?urt|ghee",
+    "contains_gluten": r"wheat|barley|rye|malt|spelt|semolina|gluten|couscous|triticale",
+    "contains_soy": r"soy|soya|soybeans?|edamame|tofu",
+    "contains_eggs": r"eggs?|egg (?:white|yolk|powder)|albumin|ovalbumin",
+    "contains_meat": r"beef|pork|chicken|turkey|lamb|mutton|bacon|ham|lard|tallow|gelatine?|meat",
+    "contains_fish": r"fish|anchov(?:y|ies)|tuna|salmon|sardines?|shrimps?|prawns?|crab|oysters?",
+    "contains_honey": r"honey|beeswax|carmine|cochineal|shellac",
+    "contains_caffeine": r"caffeine|coffee|guarana|tea|mate|kola",
+    "contains_alcohol": r"alcohol|ethanol|wine|beer|rum|brandy|whisk(?:e)?y|vodka|liqueur",
+    "contains_artificial_colour": r"red 40|yellow 5|yellow 6|blue 1|blue 2|e1(?:02|04|10|22|24|29|33)|tartrazine|sunset yellow|allura red|ponceau",
+    "contains_added_sugar": r"sugar|glucose(?: syrup)?|fructose|dextrose|sucrose|corn syrup|maltodextrin|invert syrup",
+    "contains_unpasteurized": r"raw milk|unpasteuri[sz]ed",
+}
+
+# condition -> (nutriment key, threshold per 100g)
+NUTRIENT_CONDITIONS = {
+    "high_sugar": ("sugars_100g", 22.5),
+    "high_salt": ("salt_100g", 1.5),
+    "high_saturated_fat": ("saturated-fat_100g", 5.0),
+    "high_carbs": ("carbohydrates_100g", 10.0),
+}
+
+_CONDITION_PATTERNS = {
+    name: re.compile(rf"\b(?:{pattern})\b") for name, pattern in INGREDIENT_CONDITIONS.items()
+}
+
+# ---------------------------
+# Profile rules
+# ---------------------------
+# (profile attribute, product condition, risk level, message)
+# Profile attributes are "allergy:<x>", "diet:<x>", "condition:<x>" and "age:child".
+PROFILE_RULES = [
+    ("allergy:nuts", "contains_nuts", "High", "Contains nuts or peanuts."),
+    ("allergy:dairy", "contains_dairy", "High", "Contains milk or dairy ingredients."),
+    ("allergy:gluten", "contains_gluten", "High", "Contains gluten-bearing grains."),
+    ("allergy:soy", "contains_soy", "High", "Contains soy."),
+    ("allergy:eggs", "contains_eggs", "High", "Contains egg."),
+    ("diet:vegan", "contains_meat", "Medium", "Contains meat or animal-derived gelatin."),
+    ("diet:vegan", "contains_fish", "Medium", "Contains fish or seafood."),
+    ("diet:vegan", "contains_dairy", "Medium", "Contains dairy."),
+    ("diet:vegan", "contains_eggs", "Medium", "Contains egg."),
+    ("diet:vegan", "contains_honey", "Low", "Contains honey or other insect-derived ingredients."),
+    ("diet:vegetarian", "contains_meat", "Medium", "Contains meat or animal-derived gelatin."),
+    ("diet:vegetarian", "contains_fish", "Medium", "Contains fish or seafood."),
+    ("diet:keto", "high_carbs", "Medium", "High in carbohydrates."),
+    ("diet:keto", "high_sugar", "Medium", "High in sugar."),
+    ("diet:diabetic-friendly", "high_sugar", "High", "High in sugar."),
+    ("diet:diabetic-friendly", "contains_added_sugar", "Medium", "Contains added sugars."),
+    ("condition:diabetes", "high_sugar", "High", "High in sugar; may spike blood glucose."),
+    ("condition:diabetes", "contains_added_sugar", "Medium", "Contains added sugars."),
+    ("condition:pregnancy", "contains_alcohol", "High", "Contains alcohol."),
+    ("condition:pregnancy", "contains_unpasteurized", "High", "Contains unpasteurized dairy."),
+    ("condition:pregnancy", "contains_caffeine", "Medium", "Contains caffeine; limit intake during pregnancy."),
+    ("condition:hypertension", "high_salt", "High", "High in salt."),
+    ("condition:heart-disease", "high_saturated_fat", "High", "High in saturated fat."),
+    ("condition:heart-disease", "high_salt", "Medium", "High in salt."),
+    ("age:child", "contains_artificial_colour", "Medium", "Contains artificial colours linked to hyperactivity in children."),
+    ("age:child", "contains_caffeine", "Medium", "Contains caffeine."),
+]
+
+# Bit i of a mask refers to PROFILE_RULES[i]. For each attribute/condition,
+# precompute the mask of rules it enables/triggers.
+ATTRIBUTE_RULE_MASKS = {}
+CONDITION_RULE_MASKS = {}
+for _bit, (_attribute, _condition, _, _) in enumerate(PROFILE_RULES):
+    ATTRIBUTE_RULE_MASKS[_attribute] = ATTRIBUTE_RULE_MASKS.get(_attribute, 0) | (1 << _bit)
+    CONDITION_RULE_MASKS[_condition] = CONDITION_RULE_MASKS.get(_condition, 0) | (1 << _bit)
+
+CHILD_AGE_LIMIT = 12
+
+def profile_attributes(allergies=(), dietary_preference=None, conditions=(), age=None):
+    """
+    Normalizes a health profile (as collected by survey.js / profile.js)
+    into a frozenset of profile attributes.
+    """
+    attributes = set()
+    for allergy in allergies or ():
+        attributes.add(f"allergy:{allergy.strip().lower()}")
+    if dietary_preference:
+        attributes.add(f"diet:{dietary_preference.strip().lower()}")
+    for condition in conditions or ():
+        attributes.add(f"condition:{condition.strip().lower()}")
+    try:
+        if age not in (None, "") and float(age) < CHILD_AGE_LIMIT:
+            attributes.add("age:child")
+    except (TypeError, ValueError):
+        pass
+    return frozenset(attributes)
+
+@lru_cache(maxsize=4096)
+def compile_attributes(attributes):
+    """
+    Compiles a frozenset of profile attributes into the bitset of rules that
+    apply to it. Cached, so each distinct profile compiles once.
+    """
+    mask = 0
+    for attribute in attributes:
+        mask |= ATTRIBUTE_RULE_MASKS.get(attribute, 0)
+    return mask
+
+def compile_profile(allergies=(), dietary_preference=None, conditions=(), age=None):
+    return compile_attributes(profile_attributes(allergies, dietary_preference, conditions, age))
+
+def match_product(ingredients_list, nutriments):
+    """
+    Matches a product's ingredients and nutriments once against every
+    condition. Returns (conditions, rule_mask) where rule_mask has a bit set
+    for every rule whose product condition is triggered.
+    """
+    text = ", ".join(ingredients_list or [])
+    triggered = set()
+    for name, pattern in _CONDITION_PATTERNS.items():
+        if pattern.search(text):
+            triggered.add(name)
+
+    nutriments = nutriments or {}
+    for name, (key, threshold) in NUTRIENT_CONDITIONS.items():
+        value = nutriments.get(key)
+        if isinstance(value, (int, float)) and value > threshold:
+            triggered.add(name)
+
+    mask = 0
+    for name in triggered:
+        mask |= CONDITION_RULE_MASKS.get(name, 0)
+    return triggered, mask
+
+def explain_mask(mask):
+    """
+    Expands a rule bitset into warning dictionaries, deduplicated by
+    condition (keeping the highest risk level).
+    """
+    levels = {"Low": 0, "Medium": 1, "High": 2}
+    warnings = {}
+    bit = 0
+    while mask:
+        if mask & 1:
+            attribute, condition, level, message = PROFILE_RULES[bit]
+            current = warnings.get(condition)
+            if current is None or levels[level] > levels[current["risk_level"]]:
+                warnings[condition] = {
+                    "condition": condition,
+                    "risk_level": level,
+                    "details": message,
+                    "because": attribute,
+                }
+        mask >>= 1
+        bit += 1
+    return list(warnings.values())
+
+def evaluate_profiles(product_mask, profile_masks):
+    """
+    Checks one matched product against any number of compiled profiles:
+    one bitwise AND per profile. Returns a list of warning lists.
+    """
+    return [explain_mask(product_mask & profile_mask) for profile_mask in profile_masks]
@@ -0,0 +1,204 @@
+import re
+
+# Roughly how Gemini's tokenizer splits English: word pieces of up to ~4
+# characters, and each punctuation mark on its own. Close enough to budget
+# prompts locally without an API round trip.
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+DEFAULT_TOKEN_BUDGET = 800
+
+RISK_LEVEL_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+EXPLANATION_INSTRUCTIONS = (
+    "You are an expert food safety analyst. Analyze this product for a consumer.\n"
+    "1. Explain WHY the flagged ingredients are flagged.\n"
+    "2. Assess the overall healthiness of the product.\n"
+    '3. Give a clear recommendation ("Avoid", "Consume in Moderation" or "Safe").\n'
+    "Use Markdown with bold and bullet points. Be concise but informative."
+)
+
+# Nutrients worth sending to the model; the rest of the OpenFoodFacts dict is noise
+CHAT_NUTRIENTS = (
+    ("energy-kcal_100g", "kcal"), ("sugars_100g", "sugars g"), ("salt_100g", "salt g"),
+    ("saturated-fat_100g", "sat fat g"), ("fat_100g", "fat g"), ("carbohydrates_100g", "carbs g"),
+    ("fiber_100g", "fiber g"), ("proteins_100g", "protein g"),
+)
+
+def count_tokens(text):
+    """
+    Estimates the number of model tokens in `text`.
+    """
+    return len(_TOKEN_PATTERN.findall(text or ""))
+
+def dedupe_risks(risks):
+    """
+    Merges risks that refer to the same banned ingredient, keeping the
+    highest risk level and every spelling it was found as. Sorted by level.
+    """
+    merged = {}
+    for risk in risks or []:
+        if not isinstance(risk, dict):
+            continue
+        name = str(risk.get("ingredient") or risk.get("found_as") or "").strip()
+        if not name:
+            continue
+        key = name.lower()
+        entry = merged.get(key)
+        if entry is None:
+            entry = merged[key] = {
+                "ingredient": name,
+                "risk_level": risk.get("risk_level"),
+                "details": risk.get("details"),
+                "banned_in": risk.get("banned_in"),
+                "found_as": [],
+            }
+        elif _level_rank(risk.get("risk_level")) < _level_rank(entry["risk_level"]):
+            entry["risk_level"] = risk.get("risk_level")
+        found_as = risk.get("found_as")
+        if found_as and found_as not in entry["found_as"]:
+            entry["found_as"].append(found_as)
+    return sorted(merged.values(), key=lambda r: _level_rank(r["risk_level"]))
+
+def _level_rank(level):
+    return RISK_LEVEL_ORDER.get(str(level or "").lower(), len(RISK_LEVEL_ORDER))
+
+def format_risk(risk):
+    """
+    One compact line per risk, dropping fields the model does not need.
+    """
+    line = f"- {risk['ingredient']} [{risk.get('risk_level') or '?'}]"
+    found_as = [f for f in risk.get("found_as", []) if f.lower() != risk["ingredient"].lower()]
+    if found_as:
+        line += f" as {'; '.join(found_as)}"
+    if risk.get("details"):
+        line += f": {risk['details']}"
+    banned_in = risk.get("banned_in")
+    if banned_in and banned_in != "-":
+        line += f" Banned/restricted: {banned_in}."
+    return line
+
+class _Budget:
+    def __init__(self, tokens):
+        self.remaining = tokens
+
+    def take(self, text):
+        cost = count_tokens(text) + 1
+        if cost > self.remaining:
+            return False
+        self.remaining -= cost
+        return True
+
+def _fit_lines(budget, header, lines):
+    """
+    Adds as many lines as fit, in order, noting how many were dropped.
+    """
+    if not lines or not budget.take(header):
+        return []
+    kept = [header]
+    for i, line in enumerate(lines):
+        if not budget.take(line):
+            kept.append(f"(+{len(lines) - i} more omitted)")
+            break
+        kept.append(line)
+    return kept
+
+def _fit_list(budget, label, items):
+    """
+    Fits a comma-separated list on one line, truncating from the end.
+    """
+    if not items:
+        return []
+    # Label, colon and line break, then each item plus its separating comma
+    used = count_tokens(label) + 2
+    kept = []
+    for item in items:
+        cost = count_tokens(item) + 1
+        if used + cost > budget.remaining:
+            break
+        used += cost
+        kept.append(item)
+    if not kept:
+        return []
+    line = f"{label}: {', '.join(kept)}"
+    if len(kept) < len(items):
+        line += f" (+{len(items) - len(kept)} more)"
+    budget.remaining -= used
+    return [line]
+
+def build_product_section(product_name, ingredients, risks, budget):
+    """
+    Serializes one product within `budget` (a _Budget), in priority order:
+    risks first, then flagged ingredients, then the remaining ingredients.
+    """
+    lines = [f"Product: {product_name}"]
+    budget.take(lines[0])
+
+    risks = dedupe_risks(risks)
+    lines += _fit_lines(budget, "Flagged by our database:", [format_risk(r) for r in risks])
+
+    flagged = {f.lower() for r in risks for f in r["found_as"]} | {r["ingredient"].lower() for r in risks}
+    ingredients = list(dict.fromkeys(i.strip() for i in ingredients or [] if i and i.strip()))
+    flagged_ingredients = [i for i in ingredients if i.lower() in flagged]
+    other_ingredients = [i for i in ingredients if i.lower() not in flagged]
+
+    lines += _fit_list(budget, "Flagged ingredients", flagged_ingredients)
+    lines += _fit_list(budget, "Other ingredients", other_ingredients)
+    return lines
+
+def build_explanation_prompt(product_name, ingredients, risks, token_budget=DEFAULT_TOKEN_BUDGET):
+    budget = _Budget(token_budget - count_tokens(EXPLANATION_INSTRUCTIONS))
+    lines = build_product_section(product_name, ingredients, risks, budget)
+    return EXPLANATION_INSTRUCTIONS + "\n\n" + "\n".join(lines)
+
+def build_batch_prompt(products, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Prompt explaining several (product_name, ingredients, risks) tuples at once,
+    asking for a JSON object keyed by product number. The budget is split evenly.
+    """
+    instructions = (
+        EXPLANATION_INSTRUCTIONS.replace("this product", f"each of these {len(products)} products separately")
+        + '\nReturn a JSON object mapping each product number ("1", "2", ...) to its Markdown explanation.'
+    )
+    per_product = max(60, (token_budget - count_tokens(instructions)) // max(1, len(products)))
+    sections = []
+    for i, (product_name, ingredients, risks) in enumerate(products, 1):
+        lines = build_product_section(product_name, ingredients, risks, _Budget(per_product))
+        sections.append(f"[{i}]\n" + "\n".join(lines))
+    return instructions + "\n\n" + "\n\n".join(sections)
+
+def build_chat_context(product, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Compact product context for a chat session, instead of the full product dict.
+    """
+    budget = _Budget(token_budget)
+    lines = []
+    summary = f"Product: {product.get('name', 'Unknown Product')}"
+    if product.get("brand"):
+        summary += f" by {product['brand']}"
+    facts = []
+    if product.get("health_score") is not None:
+        facts.append(f"health score {round(product['health_score'])}/100")
+    if product.get("nutriscore_grade"):
+        facts.append(f"Nutri-Score {str(product['nutriscore_grade']).upper()}")
+    if product.get("nova_group"):
+        facts.append(f"NOVA {product['nova_group']}")
+    if facts:
+        summary += f" ({', '.join(facts)})"
+    budget.take(summary)
+    lines.append(summary)
+
+    nutriments = product.get("nutriments") or {}
+    nutrients = [
+        f"{label} {nutriments[key]:g}" for key, label in CHAT_NUTRIENTS
+        if isinstance(nutriments.get(key), (int, float))
+    ]
+    if nutrients:
+        line = f"Per 100g: {', '.join(nutrients)}"
+        if budget.take(line):
+            lines.append(line)
+
+    ingredients = product.get("parsed_ingredients")
+    if ingredients is None:
+        ingredients = [i.strip() for i in (product.get("ingredients_text") or "").split(",")]
+    lines += build_product_section(product.get("name"), ingredients, product.get("risks"), budget)[1:]
+    return "\n".join(lines)
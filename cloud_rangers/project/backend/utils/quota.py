@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .rate_limit import TokenBucket, is_quota_error
+
+# Request priorities, lowest value first: interactive scans go ahead of
+# background jobs, which go ahead of cache warm-up
+INTERACTIVE = 0
+BATCH = 1
+WARMUP = 2
+
+# Default limits in requests per minute, overridable with
+# {UPSTREAM}_REQUESTS_PER_MINUTE (e.g. USDA_REQUESTS_PER_MINUTE)
+DEFAULT_LIMITS = {
+    "openfoodfacts": 100,     # product reads: 100/min
+    "usda": 1000 / 60,        # 1,000/hour per API key
+    "gemini": 60,
+    "news_rss": 30,
+}
+
+class QuotaExceeded(Exception):
+    """
+    Raised when an upstream rejected a request for quota reasons, or when a
+    caller could not get a token within its maximum wait.
+    """
+    def __init__(self, upstream, retry_after=None, message=None):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(message or f"{upstream} quota exceeded")
+
+def retry_after_seconds(error):
+    """
+    Reads a Retry-After header (seconds) from an HTTP error, if present.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class UpstreamQuota:
+    """
+    Token bucket for one upstream plus a priority line: a token is only
+    handed to the highest-priority, longest-waiting caller, so lower
+    priority traffic gets whatever rate is left.
+    """
+    def __init__(self, name, requests_per_minute, burst=None):
+        self.name = name
+        rate = requests_per_minute / 60
+        self.bucket = TokenBucket(rate, capacity=burst or max(1.0, min(rate * 5, 10)))
+        self.poll_interval = 0.05 if rate <= 0 else min(0.05, 1 / rate)
+        self.waiting = []  # heap of (priority, seq)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.granted = 0
+        self.timed_out = 0
+        self.quota_errors = 0
+
+    def _enter(self, priority):
+        ticket = (priority, next(self.counter))
+        with self.lock:
+            heapq.heappush(self.waiting, ticket)
+        return ticket
+
+    def _leave(self, ticket):
+        with self.lock:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+
+    def _poll(self, ticket):
+        """
+        Returns 0 if `ticket` got a token, otherwise how long to sleep.
+        """
+        with self.lock:
+            if self.waiting[0] != ticket:
+                return self.poll_interval
+            wait = self.bucket.try_acquire()
+            if wait == 0:
+                heapq.heappop(self.waiting)
+                self.granted += 1
+            return min(wait, self.poll_interval * 10)
+
+    def acquire(self, priority=INTERACTIVE, max_wait=None):
+        ticket = self._enter(priority)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    ticket = None
+                    return
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    self.timed_out += 1
+                    raise QuotaExceeded(self.name, wait, f"{self.name} quota: no capacity within {max_wait}s")
+                time.sleep(wait)
+        finally:
+            if ticket is not None:
+                self._leave(ticket)
+
+    async def acquire_async(self, priority=INTERACTIVE, max_wait=None):
+        ticket = self._enter(priority)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    ticket = None
+                    return
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    self.timed_out += 1
+                    raise QuotaExceeded(self.name, wait, f"{self.name} quota: no capacity within {max_wait}s")
+                await asyncio.sleep(wait)
+        finally:
+            if ticket is not None:
+                self._leave(ticket)
+
+    def report_quota_error(self, retry_after=None):
+        self.quota_errors += 1
+        self.bucket.pause(retry_after or max(1.0, 1 / self.bucket.rate))
+
+    def stats(self):
+        with self.lock:
+            waiting = len(self.waiting)
+        return {
+            "requests_per_minute": round(self.bucket.rate * 60, 3),
+            "waiting": waiting,
+            "granted": self.granted,
+            "timed_out": self.timed_out,
+            "quota_errors": self.quota_errors,
+        }
+
+class QuotaManager:
+    """
+    Central registry of per-upstream quotas. Upstreams without a configured
+    limit are not throttled. Interactive callers give up after
+    `interactive_max_wait` seconds instead of queueing indefinitely.
+    """
+    def __init__(self, limits=None, interactive_max_wait=10.0):
+        self.upstreams = {}
+        self.max_wait = {INTERACTIVE: interactive_max_wait}
+        for name, requests_per_minute in (limits or {}).items():
+            self.configure(name, requests_per_minute)
+
+    @classmethod
+    def from_env(cls):
+        limits = {
+            name: float(os.environ.get(f"{name.upper()}_REQUESTS_PER_MINUTE", default))
+            for name, default in DEFAULT_LIMITS.items()
+        }
+        return cls(limits, float(os.environ.get("QUOTA_INTERACTIVE_MAX_WAIT_S", 10)))
+
+    def configure(self, name, requests_per_minute, burst=None):
+        if requests_per_minute and requests_per_minute > 0:
+            self.upstreams[name] = UpstreamQuota(name, requests_per_minute, burst)
+        else:
+            self.upstreams.pop(name, None)
+
+    def acquire(self, name, priority=INTERACTIVE):
+        quota = self.upstreams.get(name)
+        if quota is not None:
+            quota.acquire(priority, self.max_wait.get(priority))
+
+    async def acquire_async(self, name, priority=INTERACTIVE):
+        quota = self.upstreams.get(name)
+        if quota is not None:
+            await quota.acquire_async(priority, self.max_wait.get(priority))
+
+    def report_quota_error(self, name, retry_after=None):
+        quota = self.upstreams.get(name)
+        if quota is not None:
+            quota.report_quota_error(retry_after)
+
+    @contextmanager
+    def track(self, name):
+        """
+        Wraps one upstream call: quota rejections pause the upstream's bucket
+        and are re-raised as QuotaExceeded.
+        """
+        try:
+            yield
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            retry_after = retry_after_seconds(e)
+            self.report_quota_error(name, retry_after)
+            raise QuotaExceeded(name, retry_after) from e
+
+    def stats(self):
+        return {name: quota.stats() for name, quota in self.upstreams.items()}
+
+quota_manager = QuotaManager.from_env()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to
+    `capacity`; callers take a token per upstream request.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes `tokens` if available. Returns 0 on success, otherwise the
+        number of seconds to wait before they will be.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Blocks the calling thread until `tokens` are available.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """
+        Waits without blocking the event loop until `tokens` are available.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Empties the bucket so no tokens are handed out for about `seconds`,
+        e.g. after the upstream reports its quota is exhausted.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+def is_quota_error(error):
+    """
+    Best-effort check for upstream rate limit / quota errors (HTTP 429,
+    google.api_core ResourceExhausted, "quota exceeded" messages).
+    """
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "QuotaExceeded"):
+        return True
+    status = getattr(error, "code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
@@ -0,0 +1,143 @@
+import logging
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Generic words that say nothing about which product was recalled
+GENERIC_TOKENS = frozenset({
+    "the", "and", "of", "with", "in", "for", "a", "an", "by", "to", "on", "over", "due",
+    "food", "foods", "product", "products", "brand", "brands", "recall", "recalls", "recalled",
+    "inc", "ltd", "llc", "co", "company", "pvt", "limited", "india", "usa", "fda", "fssai",
+    "unknown",
+})
+
+def normalize_tokens(text):
+    """
+    Lowercase ASCII word tokens ("Nestlé Kellogg's" -> ["nestle", "kelloggs"]).
+    """
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    text = text.lower().replace("'", "")
+    return TOKEN_PATTERN.findall(text)
+
+def brand_key(brand):
+    """
+    Index key for a brand: its distinctive tokens joined, e.g. "Ben & Jerry's" -> "ben jerrys".
+    Only the first brand of comma-separated lists is used.
+    """
+    first = (brand or "").split(",")[0]
+    tokens = [t for t in normalize_tokens(first) if t not in GENERIC_TOKENS]
+    return " ".join(tokens[:2]) or None
+
+def distinctive_tokens(text):
+    return {t for t in normalize_tokens(text) if len(t) > 2 and t not in GENERIC_TOKENS}
+
+class RecallIndex:
+    """
+    Maps brand keys (unigrams and bigrams of recall titles) to recall
+    entries so a product's recall status is a dictionary lookup. The whole
+    index is swapped atomically by `replace`; `version` changes every time.
+    """
+    def __init__(self):
+        self.by_key = {}
+        self.entries = []
+        self.version = 0
+        self.updated = None
+        self.lock = threading.Lock()
+
+    def replace(self, entries):
+        by_key = {}
+        indexed = []
+        for entry in entries:
+            tokens = normalize_tokens(entry["title"])
+            entry = dict(entry, tokens=frozenset(tokens))
+            indexed.append(entry)
+            keys = set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+            for key in keys:
+                if key not in GENERIC_TOKENS:
+                    by_key.setdefault(key, []).append(entry)
+        with self.lock:
+            self.by_key = by_key
+            self.entries = indexed
+            self.version += 1
+            self.updated = datetime.now()
+
+    def lookup(self, brand, name, limit=5):
+        """
+        Recall flags for a product. "product" level means a recall names the
+        brand and a word of the product name; "brand" level means only the
+        brand matched.
+        """
+        key = brand_key(brand)
+        candidates = self.by_key.get(key, ()) if key else ()
+        if not candidates:
+            return {"recalled": False, "level": None, "entries": []}
+
+        name_tokens = distinctive_tokens(name) - set(key.split())
+        product_matches = [e for e in candidates if name_tokens & e["tokens"]]
+        matches = product_matches or candidates
+        return {
+            "recalled": bool(product_matches),
+            "level": "product" if product_matches else "brand",
+            "entries": [
+                {k: e.get(k) for k in ("title", "link", "source", "date")}
+                for e in matches[:limit]
+            ],
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+class RecallCrawler:
+    """
+    Periodically pulls every feed (callables returning lists of
+    {"title", "link", "source", "date"} dicts), keeps entries from the last
+    `max_age_days`, and rebuilds the index. A failing feed keeps its
+    previous entries.
+    """
+    def __init__(self, index, feeds, interval=3600, max_age_days=180):
+        self.index = index
+        self.feeds = feeds
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self.last_entries = {}  # feed name -> entries
+        self._stop = threading.Event()
+        self._thread = None
+
+    def crawl(self):
+        for name, fetch in self.feeds.items():
+            try:
+                self.last_entries[name] = fetch()
+            except Exception as e:
+                logger.warning("Error crawling recall feed %s: %s", name, e)
+
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+        seen, entries = set(), []
+        for name, feed_entries in self.last_entries.items():
+            for entry in feed_entries:
+                if entry["link"] in seen or (entry.get("date") and entry["date"] < cutoff):
+                    continue
+                seen.add(entry["link"])
+                entries.append(dict(entry, feed=name))
+        self.index.replace(entries)
+        return len(entries)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            count = self.crawl()
+            logger.info("Recall index rebuilt with %d entries", count)
+            if self._stop.wait(self.interval):
+                return
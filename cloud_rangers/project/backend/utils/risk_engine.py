@@ -1,46 +1,124 @@
-import pandas as pd
+import hashlib
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 def load_banned_ingredients(filepath):
     """
     Loads the banned ingredients CSV into a pandas DataFrame.
     """
+    # Imported here: pandas is one of the slowest imports and only needed once rules load
+    import pandas as pd
     try:
         return pd.read_csv(filepath)
     except FileNotFoundError:
-        print(f"Banned ingredients file not found at {filepath}")
+        logger.error("Banned ingredients file not found at %s", filepath)
         return pd.DataFrame()
 
-def check_banned_ingredients(ingredients_list, banned_df):
+def rules_version(filepath):
+    """
+    Returns a short digest of the banned ingredients file, so cached or
+    revalidated results can tell which rule set they were computed with.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except FileNotFoundError:
+        return "none"
+
+def additive_tag(e_number):
+    """
+    OpenFoodFacts additive tag for an E number ("E129" -> "en:e129").
+    """
+    return f"en:{e_number.strip().lower()}"
+
+def build_rule_tables(banned_df):
+    """
+    Precomputes the lookup tables used by check_banned_ingredients:
+    (rules as (lowercase name, risk) pairs in file order, additive tag -> risk).
+    Cached on the DataFrame, so it is built once per rules load.
+    """
+    tables = banned_df.attrs.get("rule_tables")
+    if tables is not None:
+        return tables
+
+    rules, by_tag = [], {}
+    for row in banned_df.to_dict("records"):
+        risk = {
+            "ingredient": row['Ingredient'],
+            "risk_level": row['Risk Level'],
+            "details": row['Details'],
+            "banned_in": row['Banned In'],
+        }
+        rules.append((str(row['Ingredient']).lower(), risk))
+        e_numbers = row.get('E Numbers')
+        if isinstance(e_numbers, str):
+            for e_number in e_numbers.split():
+                by_tag[additive_tag(e_number)] = risk
+    tables = (rules, by_tag)
+    banned_df.attrs["rule_tables"] = tables
+    return tables
+
+def _rule_signatures(banned_df):
+    signatures = {}
+    for row in banned_df.to_dict("records"):
+        e_numbers = row.get('E Numbers')
+        tags = frozenset(additive_tag(e) for e in e_numbers.split()) if isinstance(e_numbers, str) else frozenset()
+        # NaN != NaN, so blank cells are compared as None
+        risk = tuple(None if v != v else v for v in (row['Ingredient'], row['Risk Level'], row['Details'], row['Banned In']))
+        signatures.setdefault(str(row['Ingredient']).lower(), []).append((risk, tags))
+    return signatures
+
+def diff_rules(old_df, new_df):
+    """
+    Compares two rule sets. Returns (names, tags): the lowercase ingredient
+    names and additive tags of every rule that was added, removed or
+    modified, i.e. what a product must mention for its risks to change.
+    """
+    old, new = _rule_signatures(old_df), _rule_signatures(new_df)
+    names, tags = set(), set()
+    for name in old.keys() | new.keys():
+        if old.get(name) != new.get(name):
+            names.add(name)
+            for _, rule_tags in old.get(name, []) + new.get(name, []):
+                tags.update(rule_tags)
+    return names, tags
+
+def check_banned_ingredients(ingredients_list, banned_df, additives_tags=None):
     """
     Checks if any ingredient in the list is present in the banned ingredients DataFrame.
     Returns a list of dictionaries with details about the banned ingredients found.
+    Structured OpenFoodFacts `additives_tags` (e.g. "en:e129") are matched
+    first by direct lookup; text matching covers the remaining rules.
     """
     found_risks = []
     
     if banned_df.empty:
         return found_risks
 
-    # Convert banned ingredients to lower case for comparison
-    banned_df['Ingredient_Lower'] = banned_df['Ingredient'].str.lower()
-    
+    rules, by_tag = build_rule_tables(banned_df)
+
+    matched = set()
+    for tag in additives_tags or ():
+        risk = by_tag.get(tag)
+        if risk is not None and risk["ingredient"] not in matched:
+            matched.add(risk["ingredient"])
+            found_risks.append(dict(risk, found_as=tag.split(":", 1)[-1].upper()))
+
     for ingredient in ingredients_list:
         # Check for exact matches first
-        match = banned_df[banned_df['Ingredient_Lower'] == ingredient]
+        match = [risk for name, risk in rules if name == ingredient]
         
         # If no exact match, try partial match (e.g. "red 40" in "red 40 lake")
-        if match.empty:
-             match = banned_df[banned_df['Ingredient_Lower'].apply(lambda x: x in ingredient)]
-
-        if not match.empty:
-            for _, row in match.iterrows():
-                found_risks.append({
-                    "ingredient": row['Ingredient'],
-                    "risk_level": row['Risk Level'],
-                    "details": row['Details'],
-                    "banned_in": row['Banned In'],
-                    "found_as": ingredient
-                })
+        if not match:
+            match = [risk for name, risk in rules if name in ingredient]
+
+        for risk in match:
+            # Already reported from its additive tag
+            if risk["ingredient"] in matched:
+                continue
+            found_risks.append(dict(risk, found_as=ingredient))
 
     return found_risks
 
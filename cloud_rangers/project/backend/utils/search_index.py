@@ -0,0 +1,192 @@
+import heapq
+import re
+import threading
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Matches in the name count more than in the brand, which count more than in ingredients
+FIELD_WEIGHTS = {"name": 3, "brand": 2, "ingredients": 1}
+
+def tokenize(text):
+    """
+    Lowercases, strips accents and splits text into alphanumeric tokens.
+    """
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(t for t in text if t)
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in TOKEN_PATTERN.findall(text) if len(t) > 1 or t.isdigit()]
+
+class TrieNode:
+    __slots__ = ("children", "suggestions")
+
+    def __init__(self):
+        self.children = {}
+        # Best (-weight, -sequence, barcode) entries for every word under this prefix, kept short
+        self.suggestions = []
+
+class SearchIndex:
+    """
+    Inverted index over product name, brand and ingredients, plus a prefix
+    trie over name and brand words for single-word type-ahead. Both are
+    updated incrementally as products are analyzed or imported; past
+    `max_products` the least recently indexed product is dropped.
+    """
+    def __init__(self, max_products=100000, max_suggestions=20):
+        self.max_products = max_products
+        self.max_suggestions = max_suggestions
+        # Keep some headroom so removing a product does not leave a prefix short
+        self.suggestions_per_prefix = max_suggestions * 2
+        self.documents = {}  # barcode -> (summary, {token: weight}), in indexing order
+        self.postings = {}   # token -> {barcode: weight}
+        self.trie = TrieNode()
+        self.sequence = 0    # bumped per add, so ties go to the most recently indexed product
+        self.lock = threading.Lock()
+
+    def __contains__(self, barcode):
+        return barcode in self.documents
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, barcode, product, health_score=None):
+        weights = {}
+        for field, text in (
+            ("name", product.get("name")),
+            ("brand", product.get("brand")),
+            ("ingredients", product.get("parsed_ingredients") or product.get("ingredients_text")),
+        ):
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+
+        summary = {
+            "barcode": barcode,
+            "name": product.get("name"),
+            "brand": product.get("brand"),
+            "image_url": product.get("image_url"),
+            "health_score": health_score,
+        }
+
+        with self.lock:
+            self._remove(barcode)
+            self.sequence += 1
+            self.documents[barcode] = (summary, weights)
+            for token, weight in weights.items():
+                self.postings.setdefault(token, {})[barcode] = weight
+                if weight >= FIELD_WEIGHTS["brand"]:
+                    self._add_to_trie(token, (-weight, -self.sequence, barcode))
+            while len(self.documents) > self.max_products:
+                self._remove(next(iter(self.documents)))
+
+    def remove(self, barcode):
+        with self.lock:
+            self._remove(barcode)
+
+    def _remove(self, barcode):
+        old = self.documents.pop(barcode, None)
+        if old is None:
+            return
+        for token, weight in old[1].items():
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(barcode, None)
+                if not posting:
+                    del self.postings[token]
+            if weight >= FIELD_WEIGHTS["brand"]:
+                self._remove_from_trie(token, barcode)
+
+    def _add_to_trie(self, token, entry):
+        node = self.trie
+        for char in token:
+            node = node.children.setdefault(char, TrieNode())
+            suggestions = node.suggestions
+            # One slot per product, even if several of its words share this prefix
+            held = next((e for e in suggestions if e[2] == entry[2]), None)
+            if held is not None:
+                if held <= entry:
+                    continue
+                suggestions.remove(held)
+            if len(suggestions) < self.suggestions_per_prefix:
+                suggestions.append(entry)
+                suggestions.sort()
+            elif entry < suggestions[-1]:
+                suggestions[-1] = entry
+                suggestions.sort()
+
+    def _remove_from_trie(self, token, barcode):
+        path = [self.trie]
+        for char in token:
+            node = path[-1].children.get(char)
+            if node is None:
+                break
+            node.suggestions = [e for e in node.suggestions if e[2] != barcode]
+            path.append(node)
+        # Prune the branches no product uses any more
+        for parent, char, node in reversed(list(zip(path, token, path[1:]))):
+            if node.suggestions or node.children:
+                break
+            del parent.children[char]
+
+    def search(self, query, limit=10):
+        """
+        Ranked search: products containing every query token first, scored by
+        field weight. Falls back to any-token matches when nothing matches all.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self.lock:
+            postings = [self.postings.get(t, {}) for t in tokens]
+            candidates = set(min(postings, key=len))
+            for posting in postings:
+                candidates.intersection_update(posting)
+            if not candidates:
+                candidates = set().union(*postings)
+
+            scores = dict.fromkeys(candidates, 0)
+            for posting in postings:
+                for barcode, weight in posting.items():
+                    if barcode in scores:
+                        scores[barcode] -= weight
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [self.documents[barcode][0] for barcode, _ in best]
+
+    def autocomplete(self, prefix, limit=10):
+        """
+        Type-ahead suggestions. Earlier words must match whole tokens; the
+        last word is treated as a prefix of a name or brand word. A single
+        word is answered from the trie (at most max_suggestions results);
+        with earlier words the candidates come from their postings instead.
+        """
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        *complete, last = tokens
+        limit = min(limit, self.max_suggestions)
+
+        with self.lock:
+            if not complete:
+                node = self.trie
+                for char in last:
+                    node = node.children.get(char)
+                    if node is None:
+                        return []
+                return [self.documents[barcode][0] for _, _, barcode in node.suggestions[:limit]]
+
+            postings = [self.postings.get(t, {}) for t in complete]
+            candidates = set(min(postings, key=len))
+            for posting in postings:
+                candidates.intersection_update(posting)
+
+            scores = {}
+            for barcode in candidates:
+                weights = self.documents[barcode][1]
+                best = max((w for t, w in weights.items() if w >= FIELD_WEIGHTS["brand"] and t.startswith(last)), default=0)
+                if best:
+                    scores[barcode] = -best - sum(posting[barcode] for posting in postings)
+            top = heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [self.documents[barcode][0] for barcode, _ in top]
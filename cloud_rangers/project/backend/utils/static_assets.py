@@ -0,0 +1,114 @@
+import gzip
+import logging
+import mimetypes
+import os
+import re
+from .http_utils import strong_etag, etag_matches, accepted_encodings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# e.g. app.3f2a9c1b.js or styles-3f2a9c1b4d.css: the name changes whenever the content does
+FINGERPRINT_PATTERN = re.compile(r"[.-][0-9a-f]{8,}\.[a-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# Compressing tiny files costs more in headers than it saves
+MIN_COMPRESS_SIZE = 512
+
+class StaticAsset:
+    """
+    A static file held in memory with its precompressed variants.
+    """
+    __slots__ = ("name", "media_type", "cache_control", "variants")
+
+    def __init__(self, name, data):
+        self.name = name
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type in ("application/javascript", "application/json"):
+            self.media_type += "; charset=utf-8"
+        self.cache_control = (
+            IMMUTABLE_CACHE_CONTROL if FINGERPRINT_PATTERN.search(name) else REVALIDATE_CACHE_CONTROL
+        )
+
+        # encoding -> (body, etag); identity is always present
+        self.variants = {"identity": (data, strong_etag(data))}
+        if len(data) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants["br"] = (compressed, strong_etag(data, "br"))
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants["gzip"] = (compressed, strong_etag(data, "gz"))
+
+    def select(self, accept_encoding):
+        """
+        Picks the smallest representation the client accepts.
+        Returns (encoding, body, etag).
+        """
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                body, etag = self.variants[encoding]
+                return encoding, body, etag
+        body, etag = self.variants["identity"]
+        return "identity", body, etag
+
+class StaticAssetCache:
+    """
+    Loads every file under a directory into memory once, precompressed with
+    gzip (and brotli when available), and serves them with strong ETags.
+    Files changed on disk are picked up on the next restart or reload().
+    """
+    def __init__(self, directory, extensions=(".html", ".js", ".css")):
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self.assets = {}
+        self.reload()
+
+    def reload(self):
+        assets = {}
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for filename in files:
+                    if not filename.endswith(self.extensions):
+                        continue
+                    path = os.path.join(root, filename)
+                    name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                    with open(path, "rb") as f:
+                        assets[name] = StaticAsset(name, f.read())
+        else:
+            logger.warning("Static asset directory not found at %s", self.directory)
+        self.assets = assets
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def render(self, name, accept_encoding=None, if_none_match=None):
+        """
+        Resolves a request for an asset.
+        Returns (status, body, headers), or None if the asset does not exist.
+        """
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        encoding, body, etag = asset.select(accept_encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+            "Content-Type": asset.media_type,
+        }
+        if etag_matches(if_none_match, etag):
+            return 304, b"", headers
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, body, headers
@@ -1,21 +1,35 @@
+import logging
 import requests
 import sys
 import os
 try:
-    from ..config import get_api_key
+    from ..config import get_api_key, get_upstream_url
 except ImportError:
     # Fallback to direct import if backend is in path
     try:
-        from config import get_api_key
+        from config import get_api_key, get_upstream_url
     except ImportError:
         # If running from root and backend not in path, add it
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from config import get_api_key
+        from config import get_api_key, get_upstream_url
+
+from .quota import quota_manager, QuotaExceeded, INTERACTIVE
+
+logger = logging.getLogger(__name__)
 
 class USDAClient:
-    def __init__(self):
+    def __init__(self, priority=INTERACTIVE):
         self.api_key = get_api_key("usda")
-        self.base_url = "https://api.nal.usda.gov/fdc/v1"
+        self.base_url = get_upstream_url("usda", "https://api.nal.usda.gov/fdc/v1")
+        # Where this client's requests queue behind the shared USDA quota
+        self.priority = priority
+
+    def _get(self, url, params):
+        quota_manager.acquire("usda", self.priority)
+        with quota_manager.track("usda"):
+            response = requests.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
 
     def search_foods(self, query, page_size=5):
         """
@@ -29,11 +43,11 @@ class USDAClient:
             "dataType": ["Branded", "Foundation"]
         }
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json().get('foods', [])
+            return self._get(url, params).get('foods', [])
+        except QuotaExceeded:
+            raise
         except Exception as e:
-            print(f"USDA Search Error: {e}")
+            logger.warning("USDA search error: %s", e)
             return []
 
     def get_food_details(self, fdc_id):
@@ -43,11 +57,11 @@ class USDAClient:
         url = f"{self.base_url}/food/{fdc_id}"
         params = {"api_key": self.api_key}
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get(url, params)
+        except QuotaExceeded:
+            raise
         except Exception as e:
-            print(f"USDA Details Error: {e}")
+            logger.warning("USDA details error: %s", e)
             return None
 
 def normalize_usda_data(usda_data):
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+from .rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class CountMinSketch:
+    """
+    Fixed-size frequency sketch. Estimates never undercount; with the
+    defaults the overcount is at most ~0.1% of all recorded accesses.
+    """
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.seeds = [zlib.crc32(f"row-{i}".encode("ascii")) for i in range(depth)]
+
+    def _cells(self, key):
+        data = key.encode("utf-8")
+        return [zlib.crc32(data, seed) % self.width for seed in self.seeds]
+
+    def add(self, key, count=1):
+        """
+        Records `count` occurrences of `key` and returns its new estimate.
+        """
+        estimate = None
+        for row, cell in zip(self.rows, self._cells(key)):
+            row[cell] += count
+            estimate = row[cell] if estimate is None else min(estimate, row[cell])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(key)))
+
+class AccessTracker:
+    """
+    Counts barcode accesses in a CountMinSketch and keeps the current top-N
+    candidates, which `flush` persists to `path` as JSON. Counts loaded from
+    a previous run are halved so popularity carries over but ages out.
+    """
+    def __init__(self, path, top_n=200, flush_interval=300):
+        self.path = path
+        self.top_n = top_n
+        self.flush_interval = flush_interval
+        self.sketch = CountMinSketch()
+        self.top = {}  # barcode -> estimated count
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        for barcode, count in load_popular(path, top_n, with_counts=True):
+            self.record(barcode, count // 2)
+
+    def record(self, barcode, count=1):
+        if count <= 0:
+            return
+        with self.lock:
+            self.top[barcode] = self.sketch.add(barcode, count)
+            # Trim lazily so most records are a dict update
+            if len(self.top) > self.top_n * 2:
+                keep = sorted(self.top.items(), key=lambda kv: kv[1], reverse=True)[:self.top_n]
+                self.top = dict(keep)
+
+    def popular(self, limit=None):
+        with self.lock:
+            ranked = sorted(self.top.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:limit or self.top_n]
+
+    def flush(self):
+        data = {
+            "updated": int(time.time()),
+            "top": [{"barcode": b, "count": c} for b, c in self.popular()],
+        }
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._safe_flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._safe_flush()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning("Error saving popular barcodes to %s: %s", self.path, e)
+
+def load_popular(path, limit=None, with_counts=False):
+    """
+    Reads the barcodes persisted by AccessTracker.flush, most popular first.
+    Returns an empty list if the file is missing or unreadable.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f).get("top", [])
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning("Error reading popular barcodes from %s: %s", path, e)
+        return []
+
+    entries = [(str(e["barcode"]), int(e.get("count", 0))) for e in entries if e.get("barcode")][:limit]
+    return entries if with_counts else [barcode for barcode, _ in entries]
+
+def warm_up(barcodes, warm, rate=2.0, stop_event=None):
+    """
+    Calls `warm(barcode)` for each barcode at no more than `rate` per second
+    so warm-up traffic leaves room for live requests. Returns the number of
+    barcodes warmed successfully.
+    """
+    bucket = TokenBucket(rate, capacity=1)
+    warmed = 0
+    for barcode in barcodes:
+        if stop_event is not None and stop_event.is_set():
+            break
+        bucket.acquire()
+        try:
+            warm(barcode)
+            warmed += 1
+        except Exception as e:
+            logger.warning("Error warming cache for %s: %s", barcode, e)
+    return warmed
@@ -1,3 +1,5 @@
+const BACKEND_URL = "http://127.0.0.1:8000";
+
 // Show Manual Search Modal
 function showManualSearch() {
     const modalEl = document.getElementById('manualSearchModal');
@@ -24,6 +26,31 @@ async function performManualSearch() {
 
     resultsContainer.innerHTML = '<p>Searching...</p>';
 
+    // Text queries try the backend's local index first (fast, no third-party round trip)
+    if (!/^\d+$/.test(query)) {
+        try {
+            const localResponse = await fetch(`${BACKEND_URL}/api/search?q=${encodeURIComponent(query)}&limit=10`);
+            if (localResponse.ok) {
+                const localData = await localResponse.json();
+                if (localData.results && localData.results.length > 0) {
+                    resultsContainer.innerHTML = '';
+                    localData.results.forEach(item => {
+                        resultsContainer.innerHTML += `
+                            <div class="card p-2 mb-2">
+                                <h5>${item.name || 'No Name'}</h5>
+                                <p><strong>Brand:</strong> ${item.brand || 'N/A'}</p>
+                                <p><strong>Barcode:</strong> ${item.barcode}</p>
+                            </div>
+                        `;
+                    });
+                    return;
+                }
+            }
+        } catch (err) {
+            console.warn('Local search unavailable, falling back to OpenFoodFacts', err);
+        }
+    }
+
     try {
         let url;
         if (/^\d+$/.test(query)) {
@@ -1,8 +1,4 @@
 import streamlit as st
-import cv2
-import numpy as np
-from PIL import Image
-import pandas as pd
 import time
 from utils.barcode_scanner import decode_barcode
 from utils.product_lookup import lookup_product
@@ -120,14 +116,21 @@ with st.sidebar:
 # ---------------------------
 if 'product_data' not in st.session_state:
     st.session_state.product_data = None
-if 'gemini_handler' not in st.session_state:
-    try:
-        st.session_state.gemini_handler = GeminiHandler()
-    except Exception:
-        st.session_state.gemini_handler = None
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+def get_gemini_handler():
+    """
+    Creates the Gemini handler on first use, so app start and sessions that
+    never reach the AI features skip the SDK import and client setup.
+    """
+    if 'gemini_handler' not in st.session_state:
+        try:
+            st.session_state.gemini_handler = GeminiHandler()
+        except Exception:
+            st.session_state.gemini_handler = None
+    return st.session_state.gemini_handler
+
 # ---------------------------
 # Main Layout
 # ---------------------------
@@ -146,6 +149,7 @@ with col1:
     with input_tabs[0]:
         uploaded_file = st.file_uploader("Upload product image", type=["jpg", "png", "jpeg"])
         if uploaded_file:
+            from PIL import Image
             image = Image.open(uploaded_file)
             st.image(image, use_column_width=True, caption="Uploaded Image")
             if st.button("🔍 Analyze Upload", key="btn_upload"):
@@ -155,6 +159,7 @@ with col1:
     with input_tabs[1]:
         camera_image = st.camera_input("Take a photo of the barcode")
         if camera_image:
+            from PIL import Image
             image = Image.open(camera_image)
             if st.button("🔍 Analyze Camera", key="btn_camera"):
                 with st.spinner("Decoding barcode..."):
@@ -190,15 +195,16 @@ with col1:
                 product['health_score'] = score
                 
                 # AI Explanation
-                if st.session_state.gemini_handler:
+                gemini_handler = get_gemini_handler()
+                if gemini_handler:
                     try:
-                        explanation = st.session_state.gemini_handler.explain_risks(
+                        explanation = gemini_handler.explain_risks(
                             product['name'], 
                             ingredients_list, 
                             risks
                         )
                         product['explanation'] = explanation
-                        st.session_state.gemini_handler.start_chat(product)
+                        gemini_handler.start_chat(product)
                     except Exception as e:
                         product['explanation'] = f"Could not generate AI explanation: {e}"
                 
@@ -290,9 +296,10 @@ with col2:
                 with st.chat_message("user"):
                     st.write(prompt)
                 
-                if st.session_state.gemini_handler:
+                gemini_handler = get_gemini_handler()
+                if gemini_handler:
                     with st.spinner("AI is thinking..."):
-                        response = st.session_state.gemini_handler.send_message(prompt)
+                        response = gemini_handler.send_message(prompt)
                     st.session_state.chat_history.append({"role": "assistant", "content": response})
                     with st.chat_message("assistant"):
                         st.write(response)
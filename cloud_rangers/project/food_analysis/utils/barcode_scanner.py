@@ -1,14 +1,15 @@
-import cv2
-import numpy as np
-from pyzbar.pyzbar import decode
-from PIL import Image
-
 def decode_barcode(image):
     """
     Decodes a barcode from a PIL Image or numpy array.
     Returns the barcode data as a string, or None if not found.
     """
     try:
+        # Imaging libraries are imported on first decode; they dominate startup time
+        import cv2
+        import numpy as np
+        from pyzbar.pyzbar import decode
+        from PIL import Image
+
         if isinstance(image, Image.Image):
             image = np.array(image.convert('RGB'))
             # Convert RGB to BGR for OpenCV
@@ -1,4 +1,3 @@
-import google.generativeai as genai
 import streamlit as st
 import os
 
@@ -13,6 +12,8 @@ class GeminiHandler:
         if not api_key:
             raise ValueError("Gemini API Key not found in secrets or environment variables.")
         
+        # Imported here so sessions that never use AI features skip the SDK import
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         # Using gemini-1.5-pro as requested (interpreted from "2.5") for premium results
         self.model = genai.GenerativeModel('gemini-1.5-pro')
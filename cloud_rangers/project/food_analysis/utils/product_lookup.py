@@ -1,4 +1,3 @@
-import openfoodfacts
 import requests
 import streamlit as st
 from .usda_client import USDAClient, normalize_usda_data
@@ -9,6 +8,7 @@ def lookup_product(barcode):
     Returns a dictionary of product data or None if not found.
     """
     try:
+        import openfoodfacts
         api = openfoodfacts.API(user_agent="FoodAnalysisApp/1.0")
         code, result = api.product.get(barcode)
 
@@ -1,10 +1,11 @@
-import pandas as pd
 import os
 
 def load_banned_ingredients(filepath):
     """
     Loads the banned ingredients CSV into a pandas DataFrame.
     """
+    # Imported here: pandas is one of the slowest imports and only needed once rules load
+    import pandas as pd
     try:
         return pd.read_csv(filepath)
     except FileNotFoundError:
@@ -5,6 +5,16 @@ if (localStorage.getItem("isLoggedIn") !== "true") {
     window.location.href = "login.html";
 }
 
+// ============================================
+// IMAGE PROXY
+// ============================================
+// Open Food Facts product images are served as cached, resized thumbnails;
+// the backend proxy refuses other hosts, so those are loaded directly
+function proxiedImage(url, width) {
+    if (!url || !/^https?:\/\/([^\/?#]+\.)?openfoodfacts\.org([:\/?#]|$)/i.test(url)) return url;
+    return `http://127.0.0.1:8000/api/image?w=${width}&url=${encodeURIComponent(url)}`;
+}
+
 // ============================================
 // TRANSFORM OPEN FOOD FACTS DATA
 // ============================================
@@ -159,7 +169,7 @@ function generateProductHTML(product, aiAnalysis) {
 
             <div class="product-header-card">
                 <div class="product-left">
-                    ${product.image ? `<img src="${product.image}" class="product-img">` : `<div class="product-placeholder">📦</div>`}
+                    ${product.image ? `<img src="${proxiedImage(product.image, 400)}" class="product-img">` : `<div class="product-placeholder">📦</div>`}
                 </div>
                 <div class="product-right">
                     <h1>${product.name}</h1>